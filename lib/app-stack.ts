@@ -74,6 +74,21 @@ export class AppStack extends cdk.Stack {
     // Grant read permissions to the OAI
     websiteBucket.grantRead(originAccessIdentity);
 
+    // Generated item images are uploaded here by the backend and served by CloudFront
+    // under /images/*, instead of being stored base64-encoded in DynamoDB
+    const imagesBucket = new s3.Bucket(this, 'ImagesBucket', {
+      encryption: s3.BucketEncryption.S3_MANAGED,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      autoDeleteObjects: true,
+      publicReadAccess: false,
+    });
+    imagesBucket.grantRead(originAccessIdentity);
+    imagesBucket.grantPut(taskRole);
+    backendService.taskDefinition.defaultContainer?.addEnvironment(
+      'IMAGES_BUCKET_NAME',
+      imagesBucket.bucketName
+    );
+
     const distribution = new cloudfront.Distribution(this, 'Distribution', {
       defaultBehavior: {
         origin: new origins.S3Origin(websiteBucket, {
@@ -82,6 +97,13 @@ export class AppStack extends cdk.Stack {
         viewerProtocolPolicy: cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
       },
       additionalBehaviors: {
+        '/images/*': {
+          origin: new origins.S3Origin(imagesBucket, {
+            originAccessIdentity: originAccessIdentity,
+          }),
+          viewerProtocolPolicy: cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+          cachePolicy: cloudfront.CachePolicy.CACHING_OPTIMIZED,
+        },
         '/api/*': {
           origin: new origins.LoadBalancerV2Origin(backendService.loadBalancer, {
             protocolPolicy: cloudfront.OriginProtocolPolicy.HTTP_ONLY,
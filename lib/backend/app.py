@@ -5,15 +5,28 @@ import tempfile
 import os
 import boto3
 import json
-from langchain_community.retrievers import AmazonKnowledgeBasesRetriever
+import logging
+import logging.handlers
+import orjson
+from langchain_core.documents import Document
 from botocore.config import Config
 import re
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 import uuid
-import base64
+import pybase64
 import random
 import io
+import threading
+from contextlib import closing
+import queue
+from collections import deque
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+import numpy as np
 from PIL import Image
 from datetime import datetime
 # Check if any of the required environment variables are missing
@@ -22,6 +35,19 @@ if any(env_var not in os.environ for env_var in required_env_vars):
     # Load environment variables from .env.local file only if any required variable is missing
     load_dotenv('.env.local')
 
+# Log records are formatted and written by a listener thread so request threads
+# never block on stdout; LOG_LEVEL=DEBUG also logs prompts and model responses
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s'))
+# The queue side only merges the message arguments; basicConfig would otherwise give it
+# its own level:name: format, and the listener's format would be applied on top
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), handlers=[_queue_handler])
+logging.handlers.QueueListener(_log_queue, _log_handler).start()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
 
@@ -31,12 +57,367 @@ customer_name = os.environ["CUSTOMER_NAME"]
 knowledge_base_id = os.environ["KNOWLEDGE_BASE_ID"]
 
 # AWS setup
-config = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
-BEDROCK_CLIENT = boto3.client("bedrock-runtime", 'us-east-1', config=config)
-DYNAMODB_CLIENT = boto3.client('dynamodb', region_name=aws_region)
+# The clients are shared by every request thread, so size the connection pool for
+# the gunicorn thread count and keep idle connections alive to avoid fresh TLS handshakes.
+# Connecting fails fast, while reads allow for slow Bedrock generations
+config = Config(
+    retries={'max_attempts': 10, 'mode': 'adaptive'},
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=120
+)
+# One session resolves the task role credentials once for all clients
+session = boto3.Session(region_name=aws_region)
+BEDROCK_CLIENT = session.client("bedrock-runtime", 'us-east-1', config=config)
+BEDROCK_AGENT_CLIENT = session.client("bedrock-agent-runtime", config=config)
+DYNAMODB_CLIENT = session.client('dynamodb', config=config)
+S3_CLIENT = session.client('s3', config=config)
 
 good_model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
 fast_model_id = "anthropic.claude-3-haiku-20240307-v1:0"
+embedding_model_id = "amazon.titan-embed-text-v2:0"
+
+# Shared pool for running independent Bedrock calls of a request concurrently
+BEDROCK_EXECUTOR = ThreadPoolExecutor(max_workers=32)
+
+def stream_converse_text(**kwargs):
+    response = BEDROCK_CLIENT.converse_stream(**kwargs)
+    for chunk in response["stream"]:
+        if "contentBlockDelta" in chunk:
+            yield chunk["contentBlockDelta"]["delta"]["text"]
+
+_PUMP_DONE = object()
+
+def _offer(events, stopped, entry):
+    # Block on a full queue, but give up once the consumer has stopped reading
+    while not stopped.is_set():
+        try:
+            events.put(entry, timeout=1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _pump(key, iterable, events, stopped):
+    # Queue (key, item, None) per item, then (key, _PUMP_DONE, error-or-None); once stopped
+    # is set the reader gives up and closes the iterable
+    try:
+        for item in iterable:
+            if not _offer(events, stopped, (key, item, None)):
+                break
+        else:
+            _offer(events, stopped, (key, _PUMP_DONE, None))
+    except Exception as e:
+        _offer(events, stopped, (key, _PUMP_DONE, e))
+    finally:
+        if stopped.is_set() and hasattr(iterable, 'close'):
+            iterable.close()
+
+def start_pump(iterable, maxsize):
+    """Read iterable on a daemon thread into a bounded queue of (None, item, error) entries,
+    ending with (None, _PUMP_DONE, error-or-None). Setting the returned event stops the
+    thread, which then closes the iterable."""
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+    threading.Thread(target=_pump, args=(None, iterable, items, stopped), daemon=True).start()
+    return items, stopped
+
+def prefetch(iterable, maxsize=32):
+    """Read iterable on a background thread up to maxsize items ahead of the consumer, so a
+    Bedrock event stream keeps draining while a slow client is being written to."""
+    items, stopped = start_pump(iterable, maxsize)
+    try:
+        while True:
+            _, item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _PUMP_DONE:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def interleave(streams, max_active, maxsize=32):
+    """Read up to max_active of the (key, iterable) pairs at once, each on a daemon thread,
+    and yield (key, item) pairs as they arrive. The next pair is only taken from streams
+    when a slot frees up. Errors are re-raised here; closing the generator stops the readers."""
+    events = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+    pending = iter(streams)
+
+    def start_next():
+        for key, iterable in pending:
+            threading.Thread(target=_pump, args=(key, iterable, events, stopped), daemon=True).start()
+            return True
+        return False
+
+    try:
+        active = 0
+        while active < max_active and start_next():
+            active += 1
+        while active:
+            key, item, error = events.get()
+            if error is not None:
+                raise error
+            if item is _PUMP_DONE:
+                if not start_next():
+                    active -= 1
+                continue
+            yield key, item
+    finally:
+        stopped.set()
+
+def with_end_marker(iterable):
+    """Yield the items of iterable followed by None, for consumers of interleave() that
+    need to know when each stream finishes."""
+    yield from iterable
+    yield None
+
+# Streamed items are grouped into one SSE event of up to this many, sent early once the
+# oldest has waited the window
+SSE_BATCH_SIZE = 4
+SSE_BATCH_WINDOW = 0.05
+
+def coalesce(iterable, max_items=SSE_BATCH_SIZE, max_wait=SSE_BATCH_WINDOW):
+    """Yield lists of items from iterable, each sent when it holds max_items or when its
+    first item has waited max_wait seconds."""
+    items, stopped = start_pump(iterable, 32)
+    batch = []
+    deadline = None
+    try:
+        while True:
+            try:
+                timeout = max(0, deadline - time.monotonic()) if batch else None
+                _, item, error = items.get(timeout=timeout)
+            except queue.Empty:
+                yield batch
+                batch = []
+                continue
+            if item is _PUMP_DONE:
+                if batch:
+                    yield batch
+                if error is not None:
+                    raise error
+                return
+            if not batch:
+                deadline = time.monotonic() + max_wait
+            batch.append(item)
+            if len(batch) >= max_items:
+                yield batch
+                batch = []
+    finally:
+        stopped.set()
+
+def stream_json_array_items(chunks):
+    """Yield the text of each top-level object in the first JSON array found in a stream of
+    text chunks, as soon as its closing brace arrives. Text around the array is ignored."""
+    buffer = ""
+    pos = 0
+    depth = 0
+    in_string = escaped = False
+    item_start = None
+    for chunk in chunks:
+        buffer += chunk
+        while pos < len(buffer):
+            char = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif depth == 0:
+                if char == '[':
+                    depth = 1
+            elif char == '"':
+                in_string = True
+            elif char in '[{':
+                if depth == 1 and char == '{':
+                    item_start = pos
+                depth += 1
+            elif char in ']}':
+                depth -= 1
+                if depth == 1 and item_start is not None:
+                    yield buffer[item_start:pos + 1]
+                    item_start = None
+                elif depth == 0:
+                    return
+            pos += 1
+
+SSE_PREFIX = b'data: '
+SSE_ERROR_PREFIX = b'error: '
+SSE_SUFFIX = b'\n\n'
+
+def sse(payload, prefix=SSE_PREFIX):
+    return prefix + orjson.dumps(payload) + SSE_SUFFIX
+
+# Fixed frames are serialized once at import rather than on every stream
+STOP_FRAME = sse({'type': 'stop'})
+SITE_ITEMS_ERROR_FRAME = sse({'error': 'Failed to retrieve or generate site items'})
+SECTION_FRAMES = {
+    (section, marker): sse({'type': f'{section}_{marker}'})
+    for section in ('press_release', 'social_media', 'customer_reviews')
+    for marker in ('start', 'end')
+}
+
+def event_stream(frames):
+    """Build the response for a generator of SSE byte frames, marked so proxies pass each
+    event through without buffering."""
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(frames, mimetype='text/event-stream', headers=headers, direct_passthrough=True)
+
+# Tokens that matter when scanning for a balanced JSON value; escapes are matched as a
+# unit so an escaped quote inside a string is skipped
+_JSON_SCAN_RE = re.compile(r'\\.|["\[\]{}]', re.DOTALL)
+
+_QUESTION_RE = re.compile(r'<question>(.*?)</question>')
+
+def extract_json(text, opener):
+    """Return the first balanced JSON object (opener '{') or array (opener '[') in text,
+    or None. Single linear pass, unlike the backtracking '.*' regexes it replaces."""
+    closer = '}' if opener == '{' else ']'
+    start = text.find(opener)
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    for match in _JSON_SCAN_RE.finditer(text, start):
+        token = match.group()
+        if in_string:
+            if token == '"':
+                in_string = False
+        elif token == '"':
+            in_string = True
+        elif token == opener:
+            depth += 1
+        elif token == closer:
+            depth -= 1
+            if depth == 0:
+                return text[start:match.end()]
+    return None
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+DYNAMODB_BATCH_SIZE = 25
+
+# Batches of one bulk write that may be in flight at once
+DYNAMODB_WRITE_CONCURRENCY = 16
+
+# DynamoDB rejects items over 400 KB
+DYNAMODB_MAX_ITEM_SIZE = 400 * 1024
+
+def attribute_size(value):
+    """Approximate DynamoDB's stored size of a low-level attribute value, in bytes."""
+    (value_type, data), = value.items()
+    if value_type in ('S', 'N'):
+        return len(data.encode())
+    if value_type == 'B':
+        return len(data)
+    if value_type == 'M':
+        return 3 + sum(len(key.encode()) + attribute_size(item) for key, item in data.items())
+    if value_type == 'L':
+        return 3 + sum(1 + attribute_size(item) for item in data)
+    if value_type in ('SS', 'NS'):
+        return sum(len(item.encode()) for item in data)
+    if value_type == 'BS':
+        return sum(len(item) for item in data)
+    return 1
+
+def item_size(item):
+    return sum(len(name.encode()) + attribute_size(value) for name, value in item.items())
+
+def write_individually(table_name, write_requests):
+    # Fallback for a batch that DynamoDB rejected as a whole, so only the invalid items are lost
+    failed = 0
+    for write_request in write_requests:
+        try:
+            if 'PutRequest' in write_request:
+                DYNAMODB_CLIENT.put_item(TableName=table_name, Item=write_request['PutRequest']['Item'])
+            else:
+                DYNAMODB_CLIENT.delete_item(TableName=table_name, Key=write_request['DeleteRequest']['Key'])
+        except ClientError as e:
+            logger.error("Error writing item to %s: %s", table_name, e)
+            failed += 1
+    if failed:
+        raise Exception(f"{failed} requests could not be written to {table_name}")
+
+def batch_write(table_name, write_requests, max_attempts=5):
+    def write_batch(batch):
+        pending = {table_name: batch}
+        for attempt in range(max_attempts):
+            try:
+                response = DYNAMODB_CLIENT.batch_write_item(RequestItems=pending)
+            except ClientError as e:
+                # One invalid request fails the whole batch, so retry its requests one by one
+                if e.response['Error']['Code'] != 'ValidationException':
+                    raise
+                write_individually(table_name, pending[table_name])
+                return
+            pending = response.get('UnprocessedItems')
+            if not pending:
+                return
+            # Back off before retrying whatever DynamoDB throttled
+            time.sleep(min(0.05 * 2 ** attempt, 2))
+        raise Exception(f"{len(pending[table_name])} requests were not processed by {table_name}")
+
+    batches = [write_requests[i:i + DYNAMODB_BATCH_SIZE] for i in range(0, len(write_requests), DYNAMODB_BATCH_SIZE)]
+    if len(batches) <= 1:
+        for batch in batches:
+            write_batch(batch)
+        return
+    # Each batch is an independent request, so larger writes send them concurrently
+    with ThreadPoolExecutor(max_workers=min(DYNAMODB_WRITE_CONCURRENCY, len(batches))) as executor:
+        for future in as_completed([executor.submit(write_batch, batch) for batch in batches]):
+            future.result()
+
+def put_items(table_name, items):
+    # Generators flush with this mid-stream, so failures are logged rather than raised.
+    # Oversized items (e.g. with a large inline image) would fail their whole batch
+    write_requests = []
+    for item in items:
+        size = item_size(item)
+        if size > DYNAMODB_MAX_ITEM_SIZE:
+            logger.warning("Skipping %s item of %s bytes: %s", table_name, size, item.get('title', {}).get('S'))
+            continue
+        write_requests.append({'PutRequest': {'Item': item}})
+    try:
+        batch_write(table_name, write_requests)
+    except Exception as e:
+        logger.error("Error storing items in DynamoDB: %s", e)
+
+# Generated items are written off the response thread so a flush never delays the next event
+WRITE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+def put_items_in_background(table_name, items):
+    return WRITE_EXECUTOR.submit(put_items, table_name, items)
+
+_SERIALIZER = TypeSerializer()
+_DESERIALIZER = TypeDeserializer()
+
+def serialize(item):
+    """Convert plain Python values to a low-level DynamoDB item ({'S': ...}, {'BOOL': ...})."""
+    return {key: _SERIALIZER.serialize(value) for key, value in item.items()}
+
+def deserialize(item):
+    """Convert a low-level DynamoDB item ({'S': ...}, {'BOOL': ...}) to plain Python values."""
+    return {key: _DESERIALIZER.deserialize(value) for key, value in item.items()}
+
+SCAN_SEGMENTS = 8
+
+def parallel_scan(segments=SCAN_SEGMENTS, **kwargs):
+    """Scan a table as `segments` parallel segments, each following its own pagination,
+    and return the raw items in segment order."""
+    def scan_segment(segment):
+        paginator = DYNAMODB_CLIENT.get_paginator('scan')
+        return [
+            item
+            for page in paginator.paginate(Segment=segment, TotalSegments=segments, **kwargs)
+            for item in page['Items']
+        ]
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        return [item for items in executor.map(scan_segment, range(segments)) for item in items]
 
 # Get the DynamoDB table name from environment variable
 PRODUCT_TABLE_NAME = os.environ.get('PRODUCT_TABLE_NAME', f"{customer_name}-kb-products")
@@ -46,17 +427,34 @@ IDEATORS_TABLE_NAME = os.environ.get('IDEATORS_TABLE_NAME', f"{customer_name}-kb
 PRODUCT_IDEAS_TABLE_NAME = os.environ.get('PRODUCT_IDEAS_TABLE_NAME', f"{customer_name}-kb-product-ideas")
 IDEA_ITEMS_TABLE_NAME = os.environ.get('IDEA_ITEMS_TABLE_NAME', f"{customer_name}-kb-idea-items")
 
-# Retriever setup
-retriever = AmazonKnowledgeBasesRetriever(
-    knowledge_base_id=knowledge_base_id,
-    retrieval_config={"vectorSearchConfiguration": {"numberOfResults": 5}},
-)
+# Generated images are uploaded here and items carry their /images/... path
+IMAGES_BUCKET_NAME = os.environ.get('IMAGES_BUCKET_NAME')
 
-# Products retriever setup
-products_retriever = AmazonKnowledgeBasesRetriever(
-    knowledge_base_id=knowledge_base_id,
-    retrieval_config={"vectorSearchConfiguration": {"numberOfResults": 15}},
+# Knowledge base retrieval, called directly on the pooled agent runtime client. Results are
+# wrapped as Documents with the same metadata shape AmazonKnowledgeBasesRetriever produced.
+# Results are cached briefly by whitespace-normalised query so repeat page loads skip the
+# vector search; the tuple keeps cached results from being mutated by callers
+CHAT_RESULTS = 5
+PRODUCT_RESULTS = 15
+
+@cached(
+    cache=TTLCache(maxsize=1024, ttl=600),
+    key=lambda query, k: hashkey(" ".join(query.split()), k),
+    lock=threading.Lock(),
 )
+def kb_retrieve(query, k):
+    response = BEDROCK_AGENT_CLIENT.retrieve(
+        knowledgeBaseId=knowledge_base_id,
+        retrievalQuery={"text": query},
+        retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": k}},
+    )
+    return tuple(
+        Document(
+            page_content=result["content"]["text"],
+            metadata={"location": result.get("location", ""), "score": result.get("score", 0)},
+        )
+        for result in response["retrievalResults"]
+    )
 
 system_prompt = """
 You are a helpful assistant that works for {customer_name}. You are an expert at answering questions about {customer_name} and their products and services. 
@@ -64,6 +462,8 @@ You are friendly and empathetic, and you are always willing to help.
 Always answer questions from {customer_name}'s perspective.
 You should always respond in English. 
 """
+# Sent with most calls, so drop the surrounding blank lines and trailing spaces once here
+system_prompt = "\n".join(line.rstrip() for line in system_prompt.strip().splitlines())
 
 # Question rewriting template
 condense_question_template = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
@@ -74,6 +474,17 @@ Chat History:
 Follow Up Input: {question}
 Standalone question:"""
 
+# Follow-ups that refer back to the conversation; anything else is already standalone and
+# skips the rewrite call unless ALWAYS_REWRITE_QUESTIONS is set
+NEEDS_REWRITE = re.compile(r'\b(it|its|they|them|their|that|this|those|these|he|she|him|her|his|hers)\b', re.IGNORECASE)
+ALWAYS_REWRITE_QUESTIONS = os.environ.get('ALWAYS_REWRITE_QUESTIONS', '').lower() in ('1', 'true', 'yes')
+
+# Only the latest turns of a long conversation are repeated into prompts
+HISTORY_TURNS_IN_PROMPT = 6
+
+def needs_rewrite(question):
+    return ALWAYS_REWRITE_QUESTIONS or len(question.split()) < 4 or NEEDS_REWRITE.search(question) is not None
+
 # Prompt template
 template = """
 Human: You are a helpful and talkative {customer_name} assistant that answers questions directly and only using the information provided in the context below. 
@@ -93,16 +504,120 @@ Question: "Hey {customer_name} Chatbot! {question}
 A:
 """
 
-# Cache basic company info
-response_cache = {}
+# The part of the template before the retrieved context only changes with the prompt
+# modifier, so it can be rendered ahead of the per-request context and question
+template_prefix = template[:template.index("Context: {context}")]
+template_suffix = template[len(template_prefix):]
+
+# Both halves are pre-rendered at import: the prefix for the default tone, and the suffix
+# split around {context} and {question} with customer_name baked in, so a request only
+# concatenates strings
+DEFAULT_PROMPT_MODIFIER = "Informative, empathetic, and friendly"
+DEFAULT_PROMPT_PREFIX = template_prefix.format(customer_name=customer_name, prompt_modifier=DEFAULT_PROMPT_MODIFIER)
+PROMPT_HEAD, _prompt_rest = template_suffix.split("{context}")
+PROMPT_MID, PROMPT_TAIL = _prompt_rest.format(customer_name=customer_name, question="{question}").split("{question}")
+
+def render_prompt_prefix(prompt_modifier):
+    if prompt_modifier == DEFAULT_PROMPT_MODIFIER:
+        return DEFAULT_PROMPT_PREFIX
+    return template_prefix.format(customer_name=customer_name, prompt_modifier=prompt_modifier)
+
+# Semantic cache for chat answers
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL_SECONDS = 3600
+
+def embed_text(text):
+    response = BEDROCK_CLIENT.invoke_model(
+        modelId=embedding_model_id,
+        body=orjson.dumps({"inputText": text, "dimensions": 256, "normalize": True})
+    )
+    embedding = orjson.loads(response["body"].read())["embedding"]
+    return np.array(embedding, dtype=np.float32)
+
+class SemanticCache:
+    """Remembers chat answers and looks them up by cosine similarity of the question embedding."""
+
+    def __init__(self, threshold, max_entries, ttl_seconds):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding, prompt_modifier):
+        with self._lock:
+            now = time.monotonic()
+            self._entries = [e for e in self._entries if now - e['created_at'] < self.ttl_seconds]
+            candidates = [e for e in self._entries if e['prompt_modifier'] == prompt_modifier]
+            if not candidates:
+                return None
+            # Embeddings are normalized, so the dot product is the cosine similarity
+            scores = np.stack([e['embedding'] for e in candidates]) @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry = candidates[best]
+            # Move the hit to the end so the least recently used entry is evicted first. Entries
+            # are matched by identity, as == on them would compare the embedding arrays
+            self._entries = [e for e in self._entries if e is not entry]
+            self._entries.append(entry)
+            return entry['response']
+
+    def add(self, embedding, prompt_modifier, response):
+        with self._lock:
+            self._entries.append({
+                'embedding': embedding,
+                'prompt_modifier': prompt_modifier,
+                'response': response,
+                'created_at': time.monotonic()
+            })
+            if len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+
+chat_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL_SECONDS)
+
+# Basic company info and the opening chat questions. They are generated once and persisted in
+# a reserved row of the site info table so every worker and task shares one copy; in memory
+# they are cached for an hour, and gunicorn.conf.py warms them in the background per worker
+# The row's item_type starts with RESERVED_ITEM_TYPE_PREFIX, which the site items API refuses
+RESERVED_ITEM_TYPE_PREFIX = '_'
+SITE_INFO_KEY = {'item_type': {'S': '_site_info'}, 'title': {'S': customer_name}}
+
+def is_reserved_item_type(item_type):
+    return item_type.startswith(RESERVED_ITEM_TYPE_PREFIX)
+
+def load_site_info(field):
+    try:
+        response = DYNAMODB_CLIENT.get_item(TableName=SITE_INFO_TABLE_NAME, Key=SITE_INFO_KEY, ProjectionExpression=field)
+    except ClientError as e:
+        logger.error("Error loading %s: %s", field, e)
+        return None
+    return response.get('Item', {}).get(field, {}).get('S')
+
+def save_site_info(field, value):
+    try:
+        DYNAMODB_CLIENT.update_item(
+            TableName=SITE_INFO_TABLE_NAME,
+            Key=SITE_INFO_KEY,
+            UpdateExpression=f'SET {field} = :value',
+            ExpressionAttributeValues={':value': {'S': value}}
+        )
+    except ClientError as e:
+        logger.error("Error saving %s: %s", field, e)
+
+@cached(cache=TTLCache(maxsize=1, ttl=3600), lock=threading.Lock())
+def get_customer_info():
+    stored = load_site_info('customer_info')
+    if stored is not None:
+        return stored
 
-customer_info_cache_key = f"customer_info_response_{customer_name}"
-        
-if customer_info_cache_key in response_cache:
-    customer_info = response_cache[customer_info_cache_key]
-else:
     customer_info_prompt = f"Who is {customer_name}? Provide a brief description of the company and its main business areas."
-    customer_info_docs = products_retriever.get_relevant_documents(f"{customer_name} company and business areas")
+    customer_info_docs = kb_retrieve(f"{customer_name} company and business areas", PRODUCT_RESULTS)
     customer_info_context = "\n".join([doc.page_content for doc in customer_info_docs])
     
     customer_info_response = BEDROCK_CLIENT.converse(
@@ -111,14 +626,20 @@ else:
         inferenceConfig={"maxTokens": 1000, "temperature": 0, "topP": 1},
     )
     customer_info = customer_info_response["output"]["message"]["content"][0]["text"]
-    print(f"Customer Info: {customer_info}")
-    response_cache[customer_info_cache_key] = customer_info
-
-chat_suggested_questions_cache_key = f"chat_suggested_questions_{customer_name}"
-
-if chat_suggested_questions_cache_key in response_cache:
-    chat_suggested_questions = response_cache[chat_suggested_questions_cache_key]
-else:
+    logger.debug("Customer Info: %s", customer_info)
+    save_site_info('customer_info', customer_info)
+    return customer_info
+
+@cached(cache=TTLCache(maxsize=1, ttl=3600), lock=threading.Lock())
+def get_default_suggested_questions():
+    # The questions are generated from the customer info, so resolve it alongside the
+    # stored-questions lookup; either way it ends up cached for the idea details
+    customer_info_future = BEDROCK_EXECUTOR.submit(get_customer_info)
+    stored = load_site_info('suggested_questions')
+    if stored is not None:
+        return orjson.loads(stored)
+
+    customer_info = customer_info_future.result()
     chat_suggested_questions_prompt = f"""Based on this information about {customer_name}: {customer_info}, generate 3-5 very short questions about the company. 
     Wrap your response in <question> tags. 
 
@@ -134,9 +655,39 @@ else:
     )
     
     suggested_questions_text = chat_suggested_questions["output"]["message"]["content"][0]["text"]
-    suggested_questions_list = re.findall(r'<question>(.*?)</question>', suggested_questions_text)
-    print(f"Suggested questions: {suggested_questions_list}")
-    response_cache[chat_suggested_questions_cache_key] = suggested_questions_list
+    suggested_questions_list = _QUESTION_RE.findall(suggested_questions_text)
+    logger.debug("Suggested questions: %s", suggested_questions_list)
+    save_site_info('suggested_questions', orjson.dumps(suggested_questions_list).decode())
+    return suggested_questions_list
+
+def warm_site_info():
+    try:
+        get_default_suggested_questions()
+    except Exception as e:
+        logger.error("Error warming site info: %s", e)
+
+def warm_clients():
+    """Open the Bedrock runtime, knowledge base, DynamoDB and S3 connections (DNS, TLS)
+    before the first user request needs them. Called once per gunicorn worker from
+    gunicorn.conf.py."""
+    try:
+        # One call per client is enough: both Claude models share the bedrock-runtime endpoint
+        BEDROCK_CLIENT.converse(
+            modelId=fast_model_id,
+            messages=[{"role": "user", "content": [{"text": "hi"}]}],
+            inferenceConfig={"maxTokens": 1},
+        )
+        # Called directly so the warmup query doesn't land in the kb_retrieve cache
+        BEDROCK_AGENT_CLIENT.retrieve(
+            knowledgeBaseId=knowledge_base_id,
+            retrievalQuery={"text": "warmup"},
+            retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": 1}},
+        )
+        DYNAMODB_CLIENT.describe_table(TableName=SITE_INFO_TABLE_NAME)
+        if IMAGES_BUCKET_NAME:
+            S3_CLIENT.head_bucket(Bucket=IMAGES_BUCKET_NAME)
+    except Exception as e:
+        logger.error("Error warming clients: %s", e)
 
 @app.route('/api/', methods=['GET'])
 def index():
@@ -144,7 +695,15 @@ def index():
         
 @app.route('/api/chat-suggested-questions', methods=['GET'])
 def get_chat_suggested_questions():
-    return response_cache[chat_suggested_questions_cache_key]
+    return get_default_suggested_questions()
+
+# Drop cached answers and retrievals after the knowledge base is re-ingested. The caches
+# are per process, so each worker that serves the request is flushed; others expire on TTL
+@app.route('/api/chat-cache', methods=['DELETE'])
+def flush_chat_cache():
+    chat_cache.clear()
+    kb_retrieve.cache_clear()
+    return jsonify({'message': 'Chat cache flushed successfully'})
 
 # Add this after other global variables
 TOOL_CONFIG = {
@@ -188,28 +747,76 @@ TOOL_CONFIG = {
     ]
 }
 
+# The product catalog changes rarely, so keep the scanned list for a few minutes
+# instead of scanning the whole table on every visualization
+@cached(cache=TTLCache(maxsize=1, ttl=300), lock=threading.Lock())
+def list_products():
+    # Convert DynamoDB items to a list of dictionaries
+    products = [{
+        'name': item.get('display_name', ''),
+        'description': item.get('description', '')
+    } for item in map(deserialize, parallel_scan(
+        TableName=PRODUCT_TABLE_NAME,
+        ProjectionExpression='display_name, description'
+    ))]
+    # Serialize once per cache fill; a byte-stable string also keeps the prompt prefix cacheable
+    return products, json.dumps(products, indent=2, sort_keys=True)
+
+# Visualizations are keyed by the normalized question and the product list they were
+# drawn from, so a refreshed catalog with different products misses the cache
+VISUALIZATION_CACHE = TTLCache(maxsize=256, ttl=600)
+VISUALIZATION_CACHE_LOCK = threading.Lock()
+
+# Questions that explicitly ask for a chart go straight to visualize_products without a
+# routing call. Questions that merely mention a chart word are left to the TOOL_CONFIG
+# router, and everything else takes the knowledge base path
+VISUALIZATION_REQUEST = re.compile(
+    r'\bvisuali[sz]e\b|\b(show|make|draw|create|generate|build)\b.*\b(chart|graph|plot|visuali[sz]ation)s?\b',
+    re.IGNORECASE
+)
+MAYBE_VISUALIZATION_REQUEST = re.compile(r'\b(chart|graph|plot|diagram|visuali[sz]ation)s?\b', re.IGNORECASE)
+
+def route_question(question):
+    """Ask the fast model which TOOL_CONFIG tool should answer question and return its name,
+    falling back to retrieve_information if routing fails."""
+    try:
+        response = BEDROCK_CLIENT.converse(
+            modelId=fast_model_id,
+            messages=[{"role": "user", "content": [{"text": question}]}],
+            toolConfig={**TOOL_CONFIG, "toolChoice": {"any": {}}},
+            inferenceConfig={"maxTokens": 200, "temperature": 0},
+        )
+    except Exception as e:
+        logger.error("Error routing question: %s", e)
+        return "retrieve_information"
+    for block in response["output"]["message"]["content"]:
+        if "toolUse" in block:
+            return block["toolUse"]["name"]
+    return "retrieve_information"
+
+def wants_visualization(question):
+    if VISUALIZATION_REQUEST.search(question):
+        return True
+    if MAYBE_VISUALIZATION_REQUEST.search(question):
+        return route_question(question) == "visualize_products"
+    return False
+
 # Add this function to generate the visualization data
 def visualize_products(question):
     # Fetch all products from DynamoDB
-    response = DYNAMODB_CLIENT.scan(
-        TableName=PRODUCT_TABLE_NAME
-    )
-    products = response['Items']
+    _, product_list_json = list_products()
 
-    # Convert DynamoDB items to a list of dictionaries
-    product_list = [
-        {
-            'name': item['display_name']['S'],
-            'description': item['description']['S']
-        }
-        for item in products
-    ]
+    cache_key = hashkey(" ".join(question.lower().split()), product_list_json)
+    with VISUALIZATION_CACHE_LOCK:
+        visualization_data = VISUALIZATION_CACHE.get(cache_key)
+    if visualization_data is not None:
+        return visualization_data
 
     # Generate visualization suggestion using LLM
     visualization_prompt = f"""
     Based on the following question about product visualization: "{question}"
     and the given list of products:
-    {json.dumps(product_list, indent=2)}
+    {product_list_json}
 
     Suggest a useful and interesting visualization. Your response should be a JSON object with the following structure:
     {{
@@ -230,7 +837,7 @@ def visualize_products(question):
     Always include 'category' and 'value' keys in each data point.
     """
 
-    print(f"Visualization prompt: {visualization_prompt}")
+    logger.debug("Visualization prompt: %s", visualization_prompt)
 
     visualization_response = BEDROCK_CLIENT.converse(
         modelId=good_model_id,
@@ -241,16 +848,15 @@ def visualize_products(question):
 
     response_content = visualization_response["output"]["message"]["content"][0]["text"]
     
-    # Use regex to find the JSON object in the response
-    json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-    if json_match:
-        json_str = json_match.group()
-        visualization_data = json.loads(json_str)
+    # Find the JSON object in the response
+    json_str = extract_json(response_content, '{')
+    if json_str:
+        visualization_data = orjson.loads(json_str)
     else:
-        print("No JSON object found in the response")
+        logger.warning("No JSON object found in the response")
         visualization_data = {}
 
-    print(f"Visualization data: {visualization_data}")
+    logger.debug("Visualization data: %s", visualization_data)
 
     # Validate and clean up the visualization data
     if 'data' in visualization_data:
@@ -260,13 +866,21 @@ def visualize_products(question):
             if 'value' not in item or not isinstance(item['value'], (int, float)):
                 item['value'] = 0
 
+    # Unparseable responses are not cached so the next request retries
+    if visualization_data:
+        with VISUALIZATION_CACHE_LOCK:
+            VISUALIZATION_CACHE[cache_key] = visualization_data
+
     return visualization_data
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     question = request.form.get('question')
-    chat_history = json.loads(request.form.get('chat_history', '[]'))
-    prompt_modifier = request.form.get('prompt_modifier', "Informative, empathetic, and friendly")
+    chat_history = orjson.loads(request.form.get('chat_history', '[]'))
+    # Start on a human turn so the pairs stay aligned
+    first_turn = max(0, len(chat_history) // 2 - HISTORY_TURNS_IN_PROMPT) * 2
+    recent_history = chat_history[first_turn:]
+    prompt_modifier = request.form.get('prompt_modifier', DEFAULT_PROMPT_MODIFIER)
     
     uploaded_file = request.files.get('document')
     document_format = request.form.get('document_format')
@@ -280,6 +894,8 @@ def chat():
 
     def generate():
         answer = ""
+        sources = []
+        question_embedding = None
         try:
             if doc_content is not None:
                 # Handle uploaded document
@@ -299,7 +915,7 @@ def chat():
                     ]
                 }
 
-                response = BEDROCK_CLIENT.converse_stream(
+                answer_request = dict(
                     modelId=good_model_id,
                     messages=[doc_message],
                     inferenceConfig={
@@ -307,54 +923,68 @@ def chat():
                         "temperature": 0
                     },
                 )
-                
-                for chunk in response["stream"]:
-                    if "contentBlockDelta" in chunk:
-                        text = chunk["contentBlockDelta"]["delta"]["text"]
-                        answer += text
-                        yield f"data: {json.dumps({'type': 'content', 'content': text})}\n\n"
-                
-                
             else:
                 # Existing logic for retrieving documents and generating response
-                if len(chat_history) >= 2:
-                    chat_history_str = "\n".join([f"Human: {chat_history[i]}\nAI: {chat_history[i+1]}" for i in range(0, len(chat_history) - 1, 2)])
+                if len(chat_history) >= 2 and needs_rewrite(question):
+                    chat_history_str = "\n".join(f"Human: {recent_history[i]}\nAI: {recent_history[i+1]}" for i in range(0, len(recent_history) - 1, 2))
                     rewrite_prompt = condense_question_template.format(chat_history=chat_history_str, question=question)
                     try:
                         rewrite_response = BEDROCK_CLIENT.converse(
-                            modelId=good_model_id,
-                            system=[{"text": system_prompt}],
+                            modelId=fast_model_id,
                             messages=[{"role": "user", "content": [{"text": rewrite_prompt}]}],
-                            inferenceConfig={"maxTokens": 512, "temperature": 0, "topP": 1},
+                            inferenceConfig={"maxTokens": 128, "temperature": 0, "topP": 1},
                         )
                         rewritten_question = rewrite_response["output"]["message"]["content"][0]["text"]
                     except Exception as e:
-                        print(f"Error in question rewriting: {e}")
+                        logger.error("Error in question rewriting: %s", e)
                         rewritten_question = question
                 else:
                     rewritten_question = question
 
-                docs = retriever.get_relevant_documents(rewritten_question)
+                # Routed on the standalone question so a follow-up like "show that as a
+                # chart" carries its context; charts come from the product table
+                if wants_visualization(rewritten_question):
+                    yield sse({'type': 'visualization', 'content': visualize_products(rewritten_question)})
+                    yield STOP_FRAME
+                    return
+
+                # Start retrieval while the semantic cache is checked; both only need the
+                # rewritten question. A hit cancels it if it has not started, otherwise its
+                # Retrieve call is still paid for and the documents are discarded
+                docs_future = BEDROCK_EXECUTOR.submit(kb_retrieve, rewritten_question, CHAT_RESULTS)
+
+                # Serve near-duplicate questions straight from the semantic cache
+                try:
+                    question_embedding = embed_text(rewritten_question)
+                    cached_response = chat_cache.lookup(question_embedding, prompt_modifier)
+                except Exception as e:
+                    logger.error("Error in semantic cache lookup: %s", e)
+                    question_embedding = None
+                    cached_response = None
+
+                if cached_response is not None:
+                    logger.info("Semantic cache hit for question: %s", rewritten_question)
+                    docs_future.cancel()
+                    yield sse({'type': 'metadata', 'sources': cached_response['sources']})
+                    yield sse({'type': 'content', 'content': cached_response['answer']})
+                    yield STOP_FRAME
+                    yield sse({'type': 'suggested_questions', 'content': cached_response['suggested_questions']})
+                    return
+
+                docs = docs_future.result()
                 context = "\n".join([doc.page_content for doc in docs])
 
-                sources = []
-                for doc in docs:
-                    if doc.metadata['location'] != "":
-                        if 'webLocation' in doc.metadata['location']:
-                            url = doc.metadata['location']['webLocation']['url']
-                            if url not in sources:
-                                sources.append(url)
-
-                yield f"data: {json.dumps({'type': 'metadata', 'sources': sources})}\n\n"
-
-                prompt = template.format(
-                    customer_name=customer_name,
-                    prompt_modifier=prompt_modifier,
-                    context=context,
-                    question=rewritten_question
-                )
+                sources = list(dict.fromkeys(
+                    doc.metadata['location']['webLocation']['url']
+                    for doc in docs
+                    if doc.metadata['location'] != "" and 'webLocation' in doc.metadata['location']
+                ))
+
+                yield sse({'type': 'metadata', 'sources': sources})
+
+                prompt = render_prompt_prefix(prompt_modifier) + PROMPT_HEAD + context + PROMPT_MID + rewritten_question + PROMPT_TAIL
 
-                response = BEDROCK_CLIENT.converse_stream(
+                answer_request = dict(
                     modelId=good_model_id,
                     system=[{"text": system_prompt}],
                     messages=[{"role": "user", "content": [{"text": prompt}]}],
@@ -364,20 +994,21 @@ def chat():
                     }
                 )
 
-                
-                for chunk in response["stream"]:
-                    if "contentBlockDelta" in chunk:
-                        text = chunk["contentBlockDelta"]["delta"]["text"]
-                        answer += text
-                        yield f"data: {json.dumps({'type': 'content', 'content': text})}\n\n"
+            # Both branches stream their answer the same way
+            response = BEDROCK_CLIENT.converse_stream(**answer_request)
+            for chunk in prefetch(response["stream"]):
+                if "contentBlockDelta" in chunk:
+                    text = chunk["contentBlockDelta"]["delta"]["text"]
+                    answer += text
+                    yield sse({'type': 'content', 'content': text})
 
-            yield f"data: {json.dumps({'type': 'stop'})}\n\n"
+            yield STOP_FRAME
 
             # Generate new suggested questions
             suggested_questions_prompt = f"""Based on the following conversation history and the last answer:
 
             Conversation History:
-            {chat_history}
+            {recent_history}
 
             Last Question:
             {question}
@@ -393,7 +1024,7 @@ def chat():
             Provide only the JSON array, without any additional text or explanation.
             """
 
-            print(f"Suggested questions prompt: {suggested_questions_prompt}")
+            logger.debug("Suggested questions prompt: %s", suggested_questions_prompt)
 
             suggested_questions_response = BEDROCK_CLIENT.converse(
                 modelId=fast_model_id,
@@ -403,19 +1034,23 @@ def chat():
             )
 
             suggested_questions_text = suggested_questions_response["output"]["message"]["content"][0]["text"]
-            suggested_questions_list = json.loads(suggested_questions_text)
+            suggested_questions_list = orjson.loads(suggested_questions_text)
 
-            yield f"data: {json.dumps({'type': 'suggested_questions', 'content': suggested_questions_list})}\n\n"
+            yield sse({'type': 'suggested_questions', 'content': suggested_questions_list})
+
+            if question_embedding is not None:
+                chat_cache.add(question_embedding, prompt_modifier, {
+                    'sources': sources,
+                    'answer': answer,
+                    'suggested_questions': suggested_questions_list
+                })
 
         except Exception as e:
             error_message = str(e)
-            print(f"Error in chat generation: {error_message}")
-            import traceback
-            print("Error details:")
-            print(traceback.format_exc())
-            yield f"error: {json.dumps({'content': error_message})}\n\n"
+            logger.exception("Error in chat generation: %s", error_message)
+            yield sse({'content': error_message}, SSE_ERROR_PREFIX)
 
-    return Response(generate(), mimetype='text/event-stream')
+    return event_stream(generate())
 
 @app.route('/api/site-items', methods=['GET'])
 def get_site_items():
@@ -423,92 +1058,296 @@ def get_site_items():
     item_type = request.args.get('item_type', default='', type=str)
     limit = request.args.get('limit', default=12, type=int)
     generate_images = request.args.get('generate_images', default='False', type=str).lower() == 'true'
-    print("generate_images: ", generate_images)
+    # Clients that send batch=true receive arrays of up to SSE_BATCH_SIZE items per event
+    batch = request.args.get('batch', default='false', type=str).lower() == 'true'
+    logger.debug("generate_images: %s", generate_images)
     if not prompt or not item_type:
         return jsonify({'error': 'Both prompt and item_type are required'}), 400
+    if is_reserved_item_type(item_type):
+        return jsonify({'error': 'Invalid item_type'}), 400
 
     def generate():
         try:
-            print(f"Searching for existing items in DynamoDB for prompt: {prompt}, item_type: {item_type}")
-            # Initialize pagination variables
-            last_evaluated_key = None
+            logger.info("Searching for existing items in DynamoDB for prompt: %s, item_type: %s", prompt, item_type)
             items_count = 0
 
-            while True:
-                # Prepare query parameters
-                query_params = {
-                    'TableName': SITE_INFO_TABLE_NAME,
-                    'KeyConditionExpression': 'item_type = :item_type',
-                    'ExpressionAttributeValues': {
-                        ':item_type': {'S': item_type}
-                    }
-                }
-
-                # Add ExclusiveStartKey for pagination if available
-                if last_evaluated_key:
-                    query_params['ExclusiveStartKey'] = last_evaluated_key
-
-                # Execute the query
-                response = DYNAMODB_CLIENT.query(**query_params)
-                
-                items = response.get('Items', [])
+            # The paginator follows LastEvaluatedKey; items are yielded page by page, and
+            # only the attributes sent to the client are read
+            pages = DYNAMODB_CLIENT.get_paginator('query').paginate(
+                TableName=SITE_INFO_TABLE_NAME,
+                KeyConditionExpression='item_type = :item_type',
+                ExpressionAttributeValues={
+                    ':item_type': {'S': item_type}
+                },
+                ProjectionExpression='title, description, icon, #link, image',
+                ExpressionAttributeNames={'#link': 'link'},
+                PaginationConfig={'PageSize': 100}
+            )
+            for page in pages:
+                items = page.get('Items', [])
                 items_count += len(items)
 
                 # Process and yield items
-                for item in items:
+                item_dicts = []
+                for item in map(deserialize, items):
                     item_dict = {
-                        'title': item['title']['S'],
-                        'description': item['description']['S'],
-                        'icon': item['icon']['S'],
-                        'link': item['link']['S']
+                        'title': item.get('title', ''),
+                        'description': item.get('description', ''),
+                        'icon': item.get('icon', ''),
+                        'link': item.get('link', '')
                     }
                     if 'image' in item:
-                        item_dict['image'] = item['image']['S']
-                    yield f"data: {json.dumps(item_dict)}\n\n"
+                        item_dict['image'] = item['image']
+                    item_dicts.append(item_dict)
 
-                # Check if there are more items to fetch
-                last_evaluated_key = response.get('LastEvaluatedKey')
-                if not last_evaluated_key:
-                    break
+                if batch:
+                    for i in range(0, len(item_dicts), SSE_BATCH_SIZE):
+                        yield sse(item_dicts[i:i + SSE_BATCH_SIZE])
+                else:
+                    for item_dict in item_dicts:
+                        yield sse(item_dict)
 
-            print(f"Found {items_count} items in DynamoDB")
+            logger.info("Found %s items in DynamoDB", items_count)
 
             if items_count == 0:
                 # If no items in DynamoDB, generate them based on the prompt
-                print(f"No items found in DynamoDB, generating new items")
-                for item in generate_site_items(prompt, item_type, limit, generate_images):
-                    yield f"data: {json.dumps(item)}\n\n"
+                logger.info("No items found in DynamoDB, generating new items")
+                if batch:
+                    for items in coalesce(generate_site_items(prompt, item_type, limit, generate_images)):
+                        yield sse(items)
+                else:
+                    for item in generate_site_items(prompt, item_type, limit, generate_images):
+                        yield sse(item)
 
-            yield f"data: {json.dumps({'type': 'stop'})}\n\n"
+            yield STOP_FRAME
+        except Exception as e:
+            logger.exception("Error retrieving or generating site items: %s", e)
+            yield SITE_ITEMS_ERROR_FRAME
+
+    return event_stream(generate())
+
+# Titan image generation takes seconds per image, so a document's items are imaged in
+# parallel on a bounded pool of their own
+IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# DynamoDB items are capped at 400KB, and the image shares the item with its text
+MAX_IMAGE_BYTES = 400 * 1024
+JPEG_QUALITY = 85
+
+def compress_jpeg(image, max_bytes=MAX_IMAGE_BYTES):
+    """Encode image as a JPEG no larger than max_bytes. An oversized image is downscaled
+    before its quality is lowered, since low JPEG quality degrades the picture far more
+    visibly than a smaller size; the quality search is only a last resort."""
+    buffer = io.BytesIO()
+
+    def encode(quality):
+        buffer.seek(0)
+        buffer.truncate()
+        # Optimized Huffman tables and progressive scans cost little and shave 5-10% off the
+        # size, so more images fit on the first encode
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.tell()
+
+    # Most images already fit, so a single encode is the common case
+    size = encode(JPEG_QUALITY)
+    if size <= max_bytes:
+        return buffer.getvalue()
+
+    # JPEG size scales roughly with pixel count; shrink to the budget with some headroom
+    scale = (max_bytes * 0.9 / size) ** 0.5
+    image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BILINEAR)
+    if encode(JPEG_QUALITY) <= max_bytes:
+        return buffer.getvalue()
+
+    # Binary search with lo fitting (or the floor) and hi known to be too large
+    lo, hi = 5, JPEG_QUALITY
+    best = None
+    while hi - lo > 5:
+        quality = (lo + hi) // 2
+        if encode(quality) <= max_bytes:
+            lo = quality
+            best = buffer.getvalue()
+        else:
+            hi = quality
+    if best is None:
+        encode(lo)
+        best = buffer.getvalue()
+    return best
+
+IMAGE_RETRY_BASE_DELAY = 1.0
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+def generate_image(image_prompt):
+    image_request = {
+        "taskType": "TEXT_IMAGE",
+        "textToImageParams": {"text": image_prompt},
+        "imageGenerationConfig": {
+            "numberOfImages": 1,
+            "quality": "standard",
+            "cfgScale": 8.0,
+            "height": 384,
+            "width": 704,
+            "seed": random.randint(0, 2147483647),
+        },
+    }
+    retries = 0
+    max_retries = 3
+    while retries < max_retries:
+        try:
+            response = BEDROCK_CLIENT.invoke_model(
+                modelId="amazon.titan-image-generator-v2:0",
+                body=orjson.dumps(image_request)
+            )
+            break  # If successful, exit the loop
+        except Exception as e:
+            retries += 1
+            if retries == max_retries:
+                logger.error("Failed to invoke model after %s attempts: %s", max_retries, e)
+                raise  # Re-raise the last exception if all retries failed
+            # Back off exponentially with jitter so concurrent image workers hitting a
+            # throttle don't all retry at the same moment
+            delay = IMAGE_RETRY_BASE_DELAY * 2 ** (retries - 1) * random.uniform(0.5, 1.5)
+            logger.warning("Attempt %s failed. Retrying in %.1fs...", retries, delay)
+            time.sleep(delay)
+    response_body = orjson.loads(response["body"].read())
+    image_base64 = response_body["images"][0]
+
+    # Compress the image to fit into 400kb
+    image_data = pybase64.b64decode(image_base64, validate=False)
+    if image_data.startswith(JPEG_MAGIC) and len(image_data) <= MAX_IMAGE_BYTES:
+        # Already a JPEG within budget: use it as-is, and inline the original base64
+        jpeg = image_data
+        if not IMAGES_BUCKET_NAME:
+            return image_base64
+    else:
+        image = Image.open(io.BytesIO(image_data))
+        # Convert once up front rather than on every trial encode (JPEG has no alpha channel)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        jpeg = compress_jpeg(image)
+
+    # Without an images bucket (e.g. running locally) fall back to inlining the image
+    if not IMAGES_BUCKET_NAME:
+        return pybase64.b64encode_as_string(jpeg)
+    key = f"images/{uuid.uuid4()}.jpg"
+    S3_CLIENT.put_object(
+        Bucket=IMAGES_BUCKET_NAME,
+        Key=key,
+        Body=jpeg,
+        ContentType='image/jpeg',
+        CacheControl='public, max-age=31536000, immutable'
+    )
+    return f"/{key}"
+
+def with_images(items):
+    """Generate an image for each item on IMAGE_EXECUTOR and yield the items as their images
+    finish, with 'image' set to the image's path (or inline base64 JPEG) or None if
+    generation failed."""
+    futures = {}
+
+    def finish(future):
+        item = futures.pop(future)
+        try:
+            item['image'] = future.result()
         except Exception as e:
-            print(f"Error retrieving or generating site items: {e}")
-            import traceback
-            print("Error details:")
-            print(traceback.format_exc())
-            yield f"data: {json.dumps({'error': 'Failed to retrieve or generate site items'})}\n\n"
+            logger.error("Error generating image: %s", e)
+            logger.debug("Image prompt: %s", item.get('image_prompt'))
+            item['image'] = None  # Set to None if image generation fails
+        return item
 
-    return Response(generate(), mimetype='text/event-stream')
+    try:
+        # items may itself be a stream, so start each image on arrival and send any that
+        # have finished while later items are still coming in
+        for item in items:
+            futures[IMAGE_EXECUTOR.submit(generate_image, item.get("image_prompt", f"A stock image of {item['title']}"))] = item
+            for future in [future for future in futures if future.done()]:
+                yield finish(future)
+        for future in as_completed(list(futures)):
+            yield finish(future)
+    finally:
+        # Don't keep generating images for a client that has gone away
+        for future in futures:
+            future.cancel()
+
+_TERM_RE = re.compile(r'\w{3,}')
+
+def term_pattern(text):
+    """Compile a case-insensitive pattern matching any word of three or more characters in
+    text, or return None if it has none."""
+    terms = set(_TERM_RE.findall(text.lower()))
+    if not terms:
+        return None
+    return re.compile(r'\b(?:' + '|'.join(map(re.escape, sorted(terms))) + ')', re.IGNORECASE)
+
+RECENT_TITLES_IN_PROMPT = 20
+
+# Docs whose extraction streams run at once; enough to overlap the Sonnet round trips
+# without inviting throttling
+EXTRACTION_CONCURRENCY = 4
+
+# Marks where each document's context goes in a pre-rendered prompt; NUL never occurs in prompt text
+_CONTEXT_SLOT = "\x00"
 
 def generate_site_items(prompt, item_type, limit, generate_images):
-    print(f"Generating items for prompt: {prompt}, item_type: {item_type}")
+    logger.info("Generating items for prompt: %s, item_type: %s", prompt, item_type)
 
     processed_titles = set()
 # To keep track of processed item titles
+    # Only the most recent titles are repeated back to the model, which keeps the prompt
+    # bounded; the set above still catches any older duplicates
+    recent_titles = deque(maxlen=RECENT_TITLES_IN_PROMPT)
     item_count = 0
 
-    docs = products_retriever.get_relevant_documents(f"{customer_name} {prompt}")
+    docs = kb_retrieve(f"{customer_name} {prompt}", PRODUCT_RESULTS)
+
+    # Each doc costs a Sonnet extraction call, so drop docs that can't yield items (no page
+    # URL or no text) and try the likeliest first: those mentioning a prompt term, then by
+    # retrieval score. The limit is then usually reached in fewer calls
+    prompt_terms = term_pattern(prompt)
+    docs = sorted(
+        (
+            doc for doc in docs
+            if doc.page_content.strip()
+            and doc.metadata['location'] != ""
+            and 'webLocation' in doc.metadata['location']
+        ),
+        key=lambda doc: (
+            prompt_terms is not None and prompt_terms.search(doc.page_content) is not None,
+            doc.metadata.get('score', 0)
+        ),
+        reverse=True
+    )
     
-    for doc in docs:
-        if item_count >= limit:
-            break  # Stop processing if we've reached the limit
+    def take_new_items(extractions):
+        # Parse the items streamed from every doc, skipping duplicates and stopping at the limit
+        nonlocal item_count
+        try:
+            for link, json_str in extractions:
+                if item_count >= limit:
+                    return  # Stop processing if we've reached the limit
+                try:
+                    item = orjson.loads(json_str)
+                except orjson.JSONDecodeError as e:
+                    logger.warning("Skipping malformed item %s: %s", json_str, e)
+                    continue
+                logger.debug("Extracted item: %s", item)
 
-        context = doc.metadata['location']['webLocation']['url'] + "\n\n" + doc.page_content
+                if item.get("title") and item["title"] not in processed_titles:
+                    processed_titles.add(item["title"])
+                    recent_titles.append(item["title"])
+                    item_count += 1
+                    item['link'] = link
+                    yield item
+        finally:
+            extractions.close()
 
-        extraction_prompt = f"""
+    # Everything but the document context is fixed for the request, so render the prompt
+    # once around a placeholder and only splice in each doc's context below
+    extraction_prompt_head, extraction_prompt_tail = f"""
         Based on the following information below about {customer_name} and the classifier: "{prompt}", extract relevant items.
         
         <context>
-        {context}
+        {_CONTEXT_SLOT}
         </context>
         
         <instructions>
@@ -535,127 +1374,67 @@ def generate_site_items(prompt, item_type, limit, generate_images):
         Think through what's being asked for in the prompt classifier: "{prompt}" and only extract the items that are relevant to the prompt.
 
         Context:
-        """
-        
-        if len(processed_titles) > 0:
-            extraction_prompt += f"\nHere are the items that have already been extracted. Do not duplicate anything of these items: {processed_titles}"
-        print(f"Extraction prompt: {extraction_prompt}")
+        """.split(_CONTEXT_SLOT, 1)
+
+    def extract(doc):
+        context = f"{doc.metadata['location']['webLocation']['url']}\n\n{doc.page_content}"
+        extraction_prompt = extraction_prompt_head + context + extraction_prompt_tail
+    
+        # Titles extracted so far are known when the doc's extraction starts; anything that
+        # overlaps with a concurrent doc is dropped as a duplicate above
+        if recent_titles:
+            extraction_prompt += f"\nHere are the items that have already been extracted. Do not duplicate anything of these items: {', '.join(recent_titles)}"
+        logger.debug("Extraction prompt: %s", extraction_prompt)
         try:
-            extraction_response = BEDROCK_CLIENT.converse(
+            # Stream the extraction so each item goes out as soon as the model closes it
+            yield from stream_json_array_items(stream_converse_text(
                 modelId=good_model_id,
                 system=[{"text": system_prompt}],
                 messages=[{"role": "user", "content": [{"text": extraction_prompt}]}],
                 inferenceConfig={"maxTokens": 1000, "temperature": 0.5, "topP": 1},
-            )
-            response_content = extraction_response["output"]["message"]["content"][0]["text"]
+            ))
+        except Exception as e:
+            logger.error("Error extracting items from document: %s", e)
 
-            print(f"Extraction response: {response_content}")
-            
-            # Use regex to find the JSON array in the response
-            json_match = re.search(r'\[.*?\]', response_content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                extracted_items = json.loads(json_str)
-            else:
-                print(f"No JSON array found in the response for document: {doc.metadata['location']['webLocation']['url']}")
-                continue
-            print(f"Extracted items: {extracted_items}")
-     
-            for item in extracted_items:
-                metadata_link = doc.metadata.get('location', {}).get('webLocation', {}).get('url')
-                if item_count >= limit:
-                    break  # Stop processing if we've reached the limit
+    # Docs are extracted EXTRACTION_CONCURRENCY at a time, started in ranked order
+    new_items = take_new_items(interleave(
+        ((doc.metadata['location']['webLocation']['url'], extract(doc)) for doc in docs),
+        EXTRACTION_CONCURRENCY
+    ))
 
-                if item.get("title") and item["title"] not in processed_titles:
-                    processed_titles.add(item["title"])
-                    item_count += 1
-                    if generate_images:
-                        # Generate an image for the item
-                        try:
-                            image_prompt = item.get("image_prompt", f"A stock image of {item['title']}")
-                            image_request = {
-                                "taskType": "TEXT_IMAGE",
-                                "textToImageParams": {"text": image_prompt},
-                                "imageGenerationConfig": {
-                                    "numberOfImages": 1,
-                                    "quality": "standard",
-                                    "cfgScale": 8.0,
-                                    "height": 384,
-                                    "width": 704,
-                                    "seed": random.randint(0, 2147483647),
-                                },
-                            }
-                            retries = 0
-                            max_retries = 3
-                            while retries < max_retries:
-                                try:
-                                    response = BEDROCK_CLIENT.invoke_model(
-                                        modelId="amazon.titan-image-generator-v2:0",
-                                        body=json.dumps(image_request)
-                                    )
-                                    break  # If successful, exit the loop
-                                except Exception as e:
-                                    retries += 1
-                                    if retries == max_retries:
-                                        print(f"Failed to invoke model after {max_retries} attempts: {str(e)}")
-                                        raise  # Re-raise the last exception if all retries failed
-                                    print(f"Attempt {retries} failed. Retrying...")
-                            response_body = json.loads(response["body"].read())
-                            image_base64 = response_body["images"][0]
-                            
-                            # Compress the image to fit into 400kb
-                            image_data = base64.b64decode(image_base64)
-                            image = Image.open(io.BytesIO(image_data))
-                            
-                            # Start with a high quality and reduce it until the image is small enough
-                            quality = 95
-                            # Resize the image to about 70% of its original width
-                            # new_width = int(image.width * 0.7)
-                            # new_height = int(image.height * (new_width / image.width))
-                            # image = image.resize((new_width, new_height), Image.LANCZOS)
-
-                            while True:
-                                buffer = io.BytesIO()
-                                image.save(buffer, format="JPEG", quality=quality)
-                                if buffer.getbuffer().nbytes <= 400 * 1024 or quality <= 5:
-                                    break
-                                quality -= 5
-                            # Convert the compressed image back to base64
-                            compressed_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                            
-                            # Add the compressed image to the item
-                            item['image'] = compressed_image_base64
-                        except Exception as e:
-                            print(f"Error generating image: {str(e)}")
-                            print(f"Image prompt: {image_prompt}")
-                            item['image'] = None  # Set to None if image generation fails
-
-                    # Store the item in DynamoDB
-                    try:
-                        dynamodb_item = {
-                            'item_type': {'S': item_type},
-                            'title': {'S': item['title']},
-                            'description': {'S': item['description']},
-                            'icon': {'S': item.get('icon', 'cube')},
-                            'link': {'S': metadata_link},
-                            'image_prompt': {'S': item.get('image_prompt', '')}
-                        }
-                        if 'image' in item and item['image']:
-                            dynamodb_item['image'] = {'S': item['image']}
-
-                        DYNAMODB_CLIENT.put_item(
-                            TableName=SITE_INFO_TABLE_NAME,
-                            Item=dynamodb_item
-                        )
-                    except Exception as e:
-                        print(f"Error storing item in DynamoDB: {str(e)}")
+    # Items are written to DynamoDB in batches as each batch fills, after its items have
+    # been sent, and the remainder once generation ends, including on client disconnect
+    pending_items = []
+    try:
+        for item in with_images(new_items) if generate_images else new_items:
+            # Queue the item for a batched write to DynamoDB
+            try:
+                dynamodb_item = {
+                    'item_type': item_type,
+                    'title': item['title'],
+                    'description': item['description'],
+                    'icon': item.get('icon', 'cube'),
+                    'link': item['link'],
+                    'image_prompt': item.get('image_prompt', '')
+                }
+                if 'image' in item and item['image']:
+                    dynamodb_item['image'] = item['image']
 
-                    yield item
+                pending_items.append(serialize(dynamodb_item))
+            except Exception as e:
+                logger.error("Error storing item in DynamoDB: %s", e)
 
-        except Exception as e:
-            print(f"Error extracting items from document: {str(e)}")
+            yield item
+
+            if len(pending_items) >= DYNAMODB_BATCH_SIZE:
+                put_items_in_background(SITE_INFO_TABLE_NAME, pending_items)
+                pending_items = []
+    finally:
+        new_items.close()
+        if pending_items:
+            put_items_in_background(SITE_INFO_TABLE_NAME, pending_items)
 
-    print(f"Total items generated: {item_count}")
+    logger.info("Total items generated: %s", item_count)
 
 from botocore.exceptions import ClientError
 
@@ -667,38 +1446,38 @@ def delete_site_item():
     
     if not item_type:
         return jsonify({'error': 'item_type is required'}), 400
+    if is_reserved_item_type(item_type):
+        return jsonify({'error': 'Invalid item_type'}), 400
 
     if not title:  # We only need to check for title, as item_type is required for both cases
         try:
-            # Scan for all items with the given item_type
-            print(f"Scanning for items with item_type: {item_type}")
-            response = DYNAMODB_CLIENT.scan(
+            # item_type is the partition key, so query its items instead of scanning the
+            # table, reading only the title sort key
+            logger.info("Querying for items with item_type: %s", item_type)
+            pages = DYNAMODB_CLIENT.get_paginator('query').paginate(
                 TableName=SITE_INFO_TABLE_NAME,
-                FilterExpression='item_type = :item_type',
-                ExpressionAttributeValues={':item_type': {'S': item_type}}
+                KeyConditionExpression='item_type = :item_type',
+                ExpressionAttributeValues={':item_type': {'S': item_type}},
+                ProjectionExpression='title'
             )
-            items = response['Items']
-            print(f"Found {len(items)} items to delete")
+            items = [item for page in pages for item in page['Items']]
+            logger.info("Found %s items to delete", len(items))
+
+            # Delete the items 25 at a time; batch_write retries anything DynamoDB throttles
+            batch_write(SITE_INFO_TABLE_NAME, [{
+                'DeleteRequest': {
+                    'Key': {
+                        'item_type': {'S': item_type},
+                        'title': {'S': item['title']['S']}  # Assuming 'title' is a string attribute
+                    }
+                }
+            } for item in items])
+            deleted_count = len(items)
 
-            # Delete each item individually
-            deleted_count = 0
-            for item in items:
-                try:
-                    DYNAMODB_CLIENT.delete_item(
-                        TableName=SITE_INFO_TABLE_NAME,
-                        Key={
-                            'item_type': {'S': item_type},
-                            'title': {'S': item['title']['S']}  # Assuming 'title' is a string attribute
-                        }
-                    )
-                    deleted_count += 1
-                except ClientError as e:
-                    print(f"Error deleting item {item['title']['S']}: {e}")
-
-            print(f"Successfully deleted {deleted_count} out of {len(items)} items")
+            logger.info("Successfully deleted %s out of %s items", deleted_count, len(items))
             return jsonify({'message': f'Successfully deleted {deleted_count} items'}), 200
-        except ClientError as e:
-            print(f"Error scanning or deleting items: {e}")
+        except Exception as e:
+            logger.error("Error querying or deleting items: %s", e)
             return jsonify({'error': 'Failed to delete items'}), 500
     else:
         try:
@@ -708,109 +1487,184 @@ def delete_site_item():
             )
             return jsonify({'message': f'Successfully deleted item: {title}'}), 200
         except ClientError as e:
-            print(f"Error deleting single item: {e}")
+            logger.error("Error deleting single item: %s", e)
             return jsonify({'error': 'Failed to delete item'}), 500
 
+# Catalogs and ideators are read on every page load but rarely edited, so their listings are
+# kept serialized in memory. A write clears this process's copy; other workers catch up
+# within the TTL
+CONFIG_CACHE_TTL_SECONDS = 30
+
+@cached(cache=TTLCache(maxsize=1, ttl=CONFIG_CACHE_TTL_SECONDS), lock=threading.Lock())
+def list_catalogs():
+    pages = DYNAMODB_CLIENT.get_paginator('scan').paginate(TableName=CATALOGS_TABLE_NAME)
+    catalogs = [item for page in pages for item in page.get('Items', [])]
+    return orjson.dumps([{
+        'id': catalog.get('id'),
+        'name': catalog.get('name'),
+        'route': catalog.get('route'),
+        'prompt': catalog.get('prompt'),
+        'generateImages': catalog.get('generateImages', False),
+        'icon': catalog.get('icon')
+    } for catalog in map(deserialize, catalogs)])
+
+@cached(cache=TTLCache(maxsize=1, ttl=CONFIG_CACHE_TTL_SECONDS), lock=threading.Lock())
+def list_ideators():
+    pages = DYNAMODB_CLIENT.get_paginator('scan').paginate(TableName=IDEATORS_TABLE_NAME)
+    ideators = [item for page in pages for item in page.get('Items', [])]
+    return orjson.dumps([{
+        'id': ideator.get('id'),
+        'name': ideator.get('name'),
+        'route': ideator.get('route'),
+        'prompt': ideator.get('prompt'),
+        'generateImages': ideator.get('generateImages', False)
+    } for ideator in map(deserialize, ideators)])
+
+@cached(cache=TTLCache(maxsize=256, ttl=CONFIG_CACHE_TTL_SECONDS), lock=threading.Lock())
+def load_ideator(ideator_id):
+    response = DYNAMODB_CLIENT.get_item(
+        TableName=IDEATORS_TABLE_NAME,
+        Key={'id': {'S': ideator_id}}
+    )
+    return response.get('Item')
+
+def clear_ideator_caches():
+    list_ideators.cache_clear()
+    load_ideator.cache_clear()
+
 @app.route('/api/catalogs', methods=['GET'])
 def get_catalogs():
     try:
-        response = DYNAMODB_CLIENT.scan(
-            TableName=CATALOGS_TABLE_NAME
-        )
-        catalogs = response.get('Items', [])
-        return jsonify([{
-            'id': catalog['id']['S'],
-            'name': catalog['name']['S'],
-            'route': catalog['route']['S'],
-            'prompt': catalog['prompt']['S'],
-            'generateImages': catalog['generateImages']['BOOL'],
-            'icon': catalog['icon']['S'] if 'icon' in catalog else None
-        } for catalog in catalogs])
+        return Response(list_catalogs(), mimetype='application/json')
     except Exception as e:
-        print(f"Error retrieving catalogs: {str(e)}")
+        logger.error("Error retrieving catalogs: %s", e)
         return jsonify({'error': 'Failed to retrieve catalogs'}), 500
 
+# Icons for common catalog names, so adding one of these skips the model call
+BUILTIN_CATALOG_ICONS = {
+    'products': 'box',
+    'services': 'concierge-bell',
+    'solutions': 'lightbulb',
+    'locations': 'location-dot',
+    'stores': 'store',
+    'events': 'calendar',
+    'news': 'newspaper',
+    'blog': 'blog',
+    'articles': 'newspaper',
+    'careers': 'briefcase',
+    'jobs': 'briefcase',
+    'team': 'users',
+    'people': 'users',
+    'leadership': 'user-tie',
+    'partners': 'handshake',
+    'customers': 'users',
+    'case studies': 'book-open',
+    'industries': 'industry',
+    'resources': 'folder-open',
+    'documentation': 'book',
+    'faq': 'circle-question',
+    'faqs': 'circle-question',
+    'support': 'headset',
+    'pricing': 'tag',
+    'offers': 'percent',
+    'deals': 'percent',
+    'features': 'star',
+    'recipes': 'utensils',
+    'menu': 'utensils',
+    'courses': 'graduation-cap',
+    'programs': 'graduation-cap',
+    'videos': 'video',
+    'podcasts': 'podcast',
+    'hotels': 'hotel',
+    'destinations': 'plane',
+    'vehicles': 'car',
+}
+
+@cached(cache=TTLCache(maxsize=1024, ttl=86400), key=lambda name: hashkey(" ".join(name.lower().split())), lock=threading.Lock())
+def suggest_icon(name):
+    builtin = BUILTIN_CATALOG_ICONS.get(" ".join(name.lower().split()))
+    if builtin:
+        return builtin
+
+    # Generate an icon using Bedrock fast model
+    icon_prompt = f"""Suggest a FontAwesome icon name (without the 'fa-' prefix) that best represents this concept: 
+    
+    {name}. 
+    
+    Respond with only the icon name, nothing else."""
+    
+    icon_response = BEDROCK_CLIENT.converse(
+        modelId=fast_model_id,
+        messages=[{"role": "user", "content": [{"text": icon_prompt}]}],
+        # A single hyphenated name is a few tokens; temperature 0 keeps the answer stable for the cache
+        inferenceConfig={"maxTokens": 12, "temperature": 0, "topP": 1},
+    )
+    
+    words = icon_response["output"]["message"]["content"][0]["text"].strip().lower().split()
+    icon_name = words[0].removeprefix('fa-') if words else ''
+    
+    # Ensure the icon name is valid (you might want to add more validation)
+    if not icon_name or len(icon_name) > 20:
+        icon_name = "list"  # Default icon if the generated one is invalid
+    return icon_name
+
 @app.route('/api/catalogs', methods=['POST'])
 def add_catalog():
     new_catalog = request.json
     try:
-        # Generate an icon using Bedrock fast model
-        icon_prompt = f"""Suggest a FontAwesome icon name (without the 'fa-' prefix) that best represents this concept: 
-        
-        {new_catalog['name']}. 
-        
-        Respond with only the icon name, nothing else."""
-        
-        icon_response = BEDROCK_CLIENT.converse(
-            modelId=fast_model_id,
-            system=[{"text": system_prompt}],
-            messages=[{"role": "user", "content": [{"text": icon_prompt}]}],
-            inferenceConfig={"maxTokens": 1000, "temperature": 0.5, "topP": 1},
-        )
-        
-        icon_name = icon_response["output"]["message"]["content"][0]["text"]
-        
-        # Ensure the icon name is valid (you might want to add more validation)
-        if not icon_name or len(icon_name) > 20:
-            icon_name = "list"  # Default icon if the generated one is invalid
+        icon_name = suggest_icon(new_catalog['name'])
         
         catalog_id = str(uuid.uuid4())
         DYNAMODB_CLIENT.put_item(
             TableName=CATALOGS_TABLE_NAME,
-            Item={
-                'id': {'S': catalog_id},
-                'name': {'S': new_catalog['name']},
-                'route': {'S': new_catalog['route']},
-                'prompt': {'S': new_catalog['prompt']},
-                'generateImages': {'BOOL': new_catalog['generateImages']},
-                'icon': {'S': icon_name}
-            }
+            Item=serialize({
+                'id': catalog_id,
+                'name': new_catalog['name'],
+                'route': new_catalog['route'],
+                'prompt': new_catalog['prompt'],
+                'generateImages': new_catalog['generateImages'],
+                'icon': icon_name
+            })
         )
+        list_catalogs.cache_clear()
         return jsonify({'id': catalog_id, **new_catalog}), 201
     except Exception as e:
-        print(f"Error adding new catalog: {str(e)}")
+        logger.error("Error adding new catalog: %s", e)
         return jsonify({'error': 'Failed to add new catalog'}), 500
 
+# Attributes a catalog or ideator update may set, with their DynamoDB types. Every
+# field has a fixed placeholder, so an update only joins the clauses for the fields sent
+EDITABLE_FIELDS = {'name': 'S', 'route': 'S', 'prompt': 'S', 'generateImages': 'BOOL'}
+EDITABLE_FIELD_CLAUSES = {field: f'#{field} = :{field}' for field in EDITABLE_FIELDS}
+
+def update_fields(table_name, item_id, updates):
+    """Set the editable fields present in updates on the item and return the updated item,
+    or None if no editable field was given."""
+    fields = [field for field in EDITABLE_FIELDS if field in updates]
+    if not fields:
+        return None
+    response = DYNAMODB_CLIENT.update_item(
+        TableName=table_name,
+        Key={'id': {'S': item_id}},
+        UpdateExpression="SET " + ", ".join(EDITABLE_FIELD_CLAUSES[field] for field in fields),
+        ExpressionAttributeNames={f'#{field}': field for field in fields},
+        ExpressionAttributeValues={f':{field}': {EDITABLE_FIELDS[field]: updates[field]} for field in fields},
+        # The stored item comes back with the update, including fields like icon
+        ReturnValues='ALL_NEW'
+    )
+    return deserialize(response['Attributes'])
+
 @app.route('/api/catalogs/<catalog_id>', methods=['PUT'])
 def update_catalog(catalog_id):
     try:
         updated_catalog = request.json
-        update_expression = []
-        expression_attribute_names = {}
-        expression_attribute_values = {}
-
-        if 'name' in updated_catalog:
-            update_expression.append('#name = :name')
-            expression_attribute_names['#name'] = 'name'
-            expression_attribute_values[':name'] = {'S': updated_catalog['name']}
-
-        if 'route' in updated_catalog:
-            update_expression.append('#route = :route')
-            expression_attribute_names['#route'] = 'route'
-            expression_attribute_values[':route'] = {'S': updated_catalog['route']}
-
-        if 'prompt' in updated_catalog:
-            update_expression.append('#prompt = :prompt')
-            expression_attribute_names['#prompt'] = 'prompt'
-            expression_attribute_values[':prompt'] = {'S': updated_catalog['prompt']}
-
-        if 'generateImages' in updated_catalog:
-            update_expression.append('#generateImages = :generateImages')
-            expression_attribute_names['#generateImages'] = 'generateImages'
-            expression_attribute_values[':generateImages'] = {'BOOL': updated_catalog['generateImages']}
-
-        if update_expression:
-            DYNAMODB_CLIENT.update_item(
-                TableName=CATALOGS_TABLE_NAME,
-                Key={'id': {'S': catalog_id}},
-                UpdateExpression="SET " + ", ".join(update_expression),
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values
-            )
+        stored_catalog = update_fields(CATALOGS_TABLE_NAME, catalog_id, updated_catalog)
+        if stored_catalog is not None:
+            list_catalogs.cache_clear()
+            return jsonify(stored_catalog)
         return jsonify(updated_catalog)
     except Exception as e:
-        print(f"Error updating catalog:")
-        print(e.with_traceback)
+        logger.exception("Error updating catalog: %s", e)
         return jsonify({'error': 'Failed to update catalog'}), 500
 
 @app.route('/api/catalogs/<catalog_id>', methods=['DELETE'])
@@ -820,9 +1674,10 @@ def delete_catalog(catalog_id):
             TableName=CATALOGS_TABLE_NAME,
             Key={'id': {'S': catalog_id}}
         )
+        list_catalogs.cache_clear()
         return jsonify({'message': 'Catalog deleted successfully'})
     except Exception as e:
-        print(f"Error deleting catalog: {str(e)}")
+        logger.error("Error deleting catalog: %s", e)
         return jsonify({'error': 'Failed to delete catalog'}), 500
 
 @app.route('/api/ideators', methods=['POST'])
@@ -832,60 +1687,31 @@ def add_ideator():
         ideator_id = str(uuid.uuid4())
         DYNAMODB_CLIENT.put_item(
             TableName=IDEATORS_TABLE_NAME,
-            Item={
-                'id': {'S': ideator_id},
-                'name': {'S': new_ideator['name']},
-                'route': {'S': new_ideator['route']},
-                'prompt': {'S': new_ideator['prompt']},
-                'generateImages': {'BOOL': new_ideator['generateImages']}
-            }
+            Item=serialize({
+                'id': ideator_id,
+                'name': new_ideator['name'],
+                'route': new_ideator['route'],
+                'prompt': new_ideator['prompt'],
+                'generateImages': new_ideator['generateImages']
+            })
         )
+        clear_ideator_caches()
         return jsonify({'id': ideator_id, **new_ideator}), 201
     except Exception as e:
-        print(f"Error adding new product ideator: {str(e)}")
-        print(e.with_traceback)
-        print(e.with_context)
+        logger.exception("Error adding new product ideator: %s", e)
         return jsonify({'error': 'Failed to add new product ideator'}), 500
 
 @app.route('/api/ideators/<ideator_id>', methods=['PUT'])
 def update_ideator(ideator_id):
     try:
         updated_ideator = request.json
-        update_expression = []
-        expression_attribute_names = {}
-        expression_attribute_values = {}
-
-        if 'name' in updated_ideator:
-            update_expression.append('#name = :name')
-            expression_attribute_names['#name'] = 'name'
-            expression_attribute_values[':name'] = {'S': updated_ideator['name']}
-
-        if 'route' in updated_ideator:
-            update_expression.append('#route = :route')
-            expression_attribute_names['#route'] = 'route'
-            expression_attribute_values[':route'] = {'S': updated_ideator['route']}
-
-        if 'prompt' in updated_ideator:
-            update_expression.append('#prompt = :prompt')
-            expression_attribute_names['#prompt'] = 'prompt'
-            expression_attribute_values[':prompt'] = {'S': updated_ideator['prompt']}
-
-        if 'generateImages' in updated_ideator:
-            update_expression.append('#generateImages = :generateImages')
-            expression_attribute_names['#generateImages'] = 'generateImages'
-            expression_attribute_values[':generateImages'] = {'BOOL': updated_ideator['generateImages']}
-
-        if update_expression:
-            DYNAMODB_CLIENT.update_item(
-                TableName=IDEATORS_TABLE_NAME,
-                Key={'id': {'S': ideator_id}},
-                UpdateExpression="SET " + ", ".join(update_expression),
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values
-            )
+        stored_ideator = update_fields(IDEATORS_TABLE_NAME, ideator_id, updated_ideator)
+        if stored_ideator is not None:
+            clear_ideator_caches()
+            return jsonify(stored_ideator)
         return jsonify(updated_ideator)
     except Exception as e:
-        print(f"Error updating ideator: {str(e)}")
+        logger.error("Error updating ideator: %s", e)
         return jsonify({'error': 'Failed to update ideator'}), 500
 
 @app.route('/api/ideators/<ideator_id>', methods=['DELETE'])
@@ -895,49 +1721,36 @@ def delete_ideator(ideator_id):
             TableName=IDEATORS_TABLE_NAME,
             Key={'id': {'S': ideator_id}}
         )
+        clear_ideator_caches()
         return jsonify({'message': 'Ideator deleted successfully'})
     except Exception as e:
-        print(f"Error deleting ideator: {str(e)}")
+        logger.error("Error deleting ideator: %s", e)
         return jsonify({'error': 'Failed to delete ideator'}), 500
 
 @app.route('/api/ideators/<ideator_id>', methods=['GET'])
 def get_ideator(ideator_id):
     try:
-        response = DYNAMODB_CLIENT.get_item(
-            TableName=IDEATORS_TABLE_NAME,
-            Key={'id': {'S': ideator_id}}
-        )
-        ideator = response.get('Item')
+        ideator = load_ideator(ideator_id)
         if ideator:
             return jsonify(ideator)
         else:
             return jsonify({'error': 'Ideator not found'}), 404
     except Exception as e:
-        print(f"Error retrieving ideator: {str(e)}")
+        logger.error("Error retrieving ideator: %s", e)
         return jsonify({'error': 'Failed to retrieve ideator'}), 500
 
 @app.route('/api/ideators', methods=['GET'])
 def get_ideators():
     try:
-        response = DYNAMODB_CLIENT.scan(
-            TableName=IDEATORS_TABLE_NAME
-        )
-        ideators = response.get('Items', [])
-        return jsonify([{
-            'id': ideator['id']['S'],
-            'name': ideator['name']['S'],
-            'route': ideator['route']['S'],
-            'prompt': ideator['prompt']['S'],
-            'generateImages': ideator['generateImages']['BOOL']
-        } for ideator in ideators])
+        return Response(list_ideators(), mimetype='application/json')
     except Exception as e:
-        print(f"Error listing ideators: {str(e)}")
+        logger.error("Error listing ideators: %s", e)
         return jsonify({'error': 'Failed to list ideators'}), 500
 
 @app.route('/api/idea-item/<item_type>/<title>', methods=['GET'])
 def get_idea_item(item_type, title):
     item_type = item_type.lower().replace(" ", "-")
-    print(f"Getting idea item for {item_type} with title {title}")
+    logger.info("Getting idea item for %s with title %s", item_type, title)
     try:
         response = DYNAMODB_CLIENT.get_item(
             TableName=IDEA_ITEMS_TABLE_NAME,
@@ -945,18 +1758,19 @@ def get_idea_item(item_type, title):
         )
         item = response.get('Item')
         if item:
+            item = deserialize(item)
             json_item = {
-                'title': item['title']['S'],
-                'description': item['description']['S'],
-                'icon': item.get('icon', {}).get('S', 'lightbulb'),
-                'image': item.get('image', {}).get('S'),
-                'link': item.get('link', {}).get('S', '')
+                'title': item.get('title', ''),
+                'description': item.get('description', ''),
+                'icon': item.get('icon', 'lightbulb'),
+                'image': item.get('image'),
+                'link': item.get('link', '')
             }
             return jsonify(json_item)
         else:
             return jsonify({'error': 'Idea item not found'}), 404
     except Exception as e:
-        print(f"Error retrieving idea item: {str(e)}")
+        logger.error("Error retrieving idea item: %s", e)
         return jsonify({'error': 'Failed to retrieve idea item'}), 500
 
 @app.route('/api/idea-items', methods=['GET'])
@@ -976,34 +1790,37 @@ def get_idea_items():
     def generate_items():
        
         # First, try to fetch existing items from DynamoDB
-        response = DYNAMODB_CLIENT.query(
+        # Only the first `limit` items are shown, so stop reading once we have them
+        pages = DYNAMODB_CLIENT.get_paginator('query').paginate(
             TableName=IDEA_ITEMS_TABLE_NAME,
             KeyConditionExpression='item_type = :item_type',
-            ExpressionAttributeValues={':item_type': {'S': item_type}}
+            ExpressionAttributeValues={':item_type': {'S': item_type}},
+            PaginationConfig={'MaxItems': limit}
         )
         
-        existing_items = response.get('Items', [])
-        print(f"Existing {len(existing_items)} items")
+        existing_items = [item for page in pages for item in page.get('Items', [])]
+        logger.info("Existing %s items", len(existing_items))
         if existing_items:
-            for dbItem in existing_items[:limit]:
+            for dbItem in map(deserialize, existing_items[:limit]):
                 item = {
-                    'title': dbItem['title']['S'],
-                    'description': dbItem['description']['S'],
-                    'icon': dbItem.get('icon', {}).get('S', 'lightbulb'),
-                    'image': dbItem.get('image', {}).get('S'),
-                    'link': dbItem.get('link', {}).get('S', '')
+                    'title': dbItem.get('title', ''),
+                    'description': dbItem.get('description', ''),
+                    'icon': dbItem.get('icon', 'lightbulb'),
+                    'image': dbItem.get('image'),
+                    'link': dbItem.get('link', '')
                 }
-                yield f"data: {json.dumps(item)}\n\n"
-            yield f"data: {json.dumps({'type': 'stop'})}\n\n"
+                yield sse(item)
+            yield STOP_FRAME
             return
         else:
-            print("No existing items found")
+            logger.warning("No existing items found")
         processed_titles = set()
         item_count = 0
         
         system_prompt = """You are an AI assistant tasked with generating product ideas based on a given prompt. 
         Provide creative and innovative product ideas that align with the prompt."""
 
+        customer_info = get_customer_info()
         extraction_prompt = f"""Based the <prompt> and <customer_info> below, generate exactly {limit} unique product ideas.
 
         <prompt>
@@ -1032,106 +1849,138 @@ def get_idea_items():
 
         Ensure each idea is unique and creative. If no clear ideas can be generated, return an empty array."""
 
-        print(f"Extraction prompt: {extraction_prompt}")
+        logger.debug("Extraction prompt: %s", extraction_prompt)
+
+        def take_new_items(item_texts):
+            # Parse ideas out of the streamed array, skipping duplicates and stopping at the limit
+            nonlocal item_count
+            for json_str in item_texts:
+                if item_count >= limit:
+                    return
+                try:
+                    item = orjson.loads(json_str)
+                except orjson.JSONDecodeError as e:
+                    logger.warning("Skipping malformed item %s: %s", json_str, e)
+                    continue
+                logger.debug("Extracted item: %s", item)
+
+                if item.get("title") and item["title"] not in processed_titles:
+                    processed_titles.add(item["title"])
+                    item_count += 1
+                    yield item
+
+        # Written in batches like generate_site_items
+        pending_items = []
         try:
-            extraction_response = BEDROCK_CLIENT.converse(
+            # Stream the extraction so each idea goes out as soon as the model closes it
+            new_items = take_new_items(stream_json_array_items(stream_converse_text(
                 modelId=good_model_id,
                 system=[{"text": system_prompt}],
                 messages=[{"role": "user", "content": [{"text": extraction_prompt}]}],
                 inferenceConfig={"maxTokens": 2000, "temperature": 0.7, "topP": 1},
-            )
-            response_content = extraction_response["output"]["message"]["content"][0]["text"]
-            print(f"Extraction response: {response_content}")
-            json_match = re.search(r'\[.*?\]', response_content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                extracted_items = json.loads(json_str)
-            else:
-                print(f"No JSON array found in the response")
-                return
+            )))
 
-            for item in extracted_items:
-                if item_count >= limit:
-                    break
+            for item in with_images(new_items) if generate_images else new_items:
+                # Queue the item for a batched write to DynamoDB
+                try:
+                    dynamodb_item = {
+                        'item_type': item_type,
+                        'title': item['title'],
+                        'description': item['description'],
+                        'icon': item.get('icon', 'lightbulb'),
+                    }
+                    if 'image' in item and item['image']:
+                        dynamodb_item['image'] = item['image']
 
-                if item.get("title") and item["title"] not in processed_titles:
-                    processed_titles.add(item["title"])
-                    item_count += 1
+                    pending_items.append(serialize(dynamodb_item))
+                except Exception as e:
+                    logger.error("Error storing item in DynamoDB: %s", e)
+                yield sse(item)
 
-                    if generate_images:
-                        # Generate an image for the item (similar to the existing code)
-                        image_prompt = item.get("image_prompt", f"A stock image of {item['title']}")
-                        
-                        image_request = {
-                            "taskType": "TEXT_IMAGE",
-                            "textToImageParams": {"text": image_prompt},
-                            "imageGenerationConfig": {
-                                "numberOfImages": 1,
-                                "quality": "standard",
-                                "cfgScale": 8.0,
-                                "height": 384,
-                                "width": 704,
-                                "seed": random.randint(0, 2147483647),
-                            },
-                        }
-                        
-                        retries = 0
-                        max_retries = 3
-                        while retries < max_retries:
-                            try:
-                                response = BEDROCK_CLIENT.invoke_model(
-                                    modelId="amazon.titan-image-generator-v2:0",
-                                    body=json.dumps(image_request)
-                                )
-                                break  # If successful, exit the loop
-                            except Exception as e:
-                                retries += 1
-                                if retries == max_retries:
-                                    print(f"Failed to invoke model after {max_retries} attempts: {str(e)}")
-                                    raise  # Re-raise the last exception if all retries failed
-                                print(f"Attempt {retries} failed. Retrying...")
-                        response_body = json.loads(response["body"].read())
-                        image_base64 = response_body["images"][0]
-
-                        # Compress the image to fit into 400kb
-                        image_data = base64.b64decode(image_base64)
-                        image = Image.open(io.BytesIO(image_data))
-                        quality = 95
-                        while True:
-                            buffer = io.BytesIO()
-                            image.save(buffer, format="JPEG", quality=quality)
-                            if buffer.getbuffer().nbytes <= 400 * 1024 or quality <= 5:
-                                break
-                            quality -= 5
-                        compressed_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                        item['image'] = compressed_image_base64
-
-                    # Store the item in DynamoDB
-                    try:
-                        dynamodb_item = {
-                            'item_type': {'S': item_type},
-                            'title': {'S': item['title']},
-                            'description': {'S': item['description']},
-                            'icon': {'S': item.get('icon', 'lightbulb')},
-                        }
-                        if 'image' in item and item['image']:
-                            dynamodb_item['image'] = {'S': item['image']}
-
-                        DYNAMODB_CLIENT.put_item(
-                            TableName=IDEA_ITEMS_TABLE_NAME,
-                            Item=dynamodb_item
-                        )
-                    except Exception as e:
-                        print(f"Error storing item in DynamoDB: {str(e)}")
-                    print(f"Item stored in DynamoDB: {item}")
-                    yield f"data: {json.dumps(item)}\n\n"
+                if len(pending_items) >= DYNAMODB_BATCH_SIZE:
+                    put_items_in_background(IDEA_ITEMS_TABLE_NAME, pending_items)
+                    pending_items = []
 
+            if item_count == 0:
+                logger.warning("No JSON array found in the response")
         except Exception as e:
-            print(f"Error generating items: {str(e)}")
+            logger.error("Error generating items: %s", e)
+        finally:
+            if pending_items:
+                put_items_in_background(IDEA_ITEMS_TABLE_NAME, pending_items)
 
-    return Response(generate_items(), mimetype='text/event-stream')
+    return event_stream(generate_items())
+
+# Idea details prompts, rendered with customer_name at import; a request only formats in
+# the idea and the cached company info
+# Generate Press Release
+PRESS_RELEASE_TEMPLATE = f"""Create a press release for the product idea titled "{{title}}" with description "{{description}}"
+
+The product is being offered by {customer_name}. Here is some additional information about the company: {{customer_info}} 
+
+Format the press release using markdown, including appropriate headers, paragraphs, and emphasis where needed.
+
+The current date is {{date}}.
+
+Do not include any framing language such as "According to the context" or "Here is an overview of" in your responses, just get straight to the point!
+ """
+# Generate Social Media Post
+SOCIAL_MEDIA_TEMPLATE = f"""Create a fun and engaging social media post for the product idea titled "{{title}}" with description "{{description}}" 
+
+The product is being offered by {customer_name}. Here is some additional information about the company: {{customer_info}} 
+Format the social media post using markdown, including appropriate emphasis and line breaks. Use emojis and hashtags where appropriate.
+
+Do not include any preamble language such as "Here is an overview of" in your responses, just get straight to the point!
+"""
+# Generate Customer Reviews
+REVIEWS_TEMPLATE = f"""
+Generate 3-4  positive and realistic customer reviews for the following product idea:
+Company Name: {customer_name}
+Product Name: {{title}}
+Product Description: {{description}}
+
+For each review, provide:
+1. A customer name (first name and last initial)
+2. A rating (4 or 5) out of 5 stars
+3. A positive, realistic comment about the product. The comment should be 2-3 sentences and relate to the 
+    product (and possibly the company)in a real-world context.
+4. Randomly decide if it's a verified purchase (70% chance) or a top reviewer (20% chance)
+
+Format the response as a JSON array of objects, like so:
+[
+    {{{{
+        "name": "John Doe",
+        "rating": 5,
+        "comment": "This product will be a game changer for my business!",
+        "verified": true/false,
+        "topReviewer": true/false
+    }}}}
+]
+
+Ensure the reviews are diverse in opinion.
+
+Do not include any preamble language such as "According to the context" or "Here is an overview of" in your responses, just get straight to the point!
+
+"""
 
 # New endpoint to generate press release and social media post
+# Details are stored as a map with one string attribute per section, so the text
+# sections are written as-is and only the reviews array goes through orjson.
+# Items written before this stored the whole dict as one JSON string.
+def dump_details(details):
+    return {'M': {
+        'press_release': {'S': details['press_release']},
+        'social_media_post': {'S': details['social_media_post']},
+        'customer_reviews': {'S': orjson.dumps(details['customer_reviews']).decode()}
+    }}
+
+def load_details(attribute):
+    if 'S' in attribute:
+        return orjson.loads(attribute['S'])
+    details = {key: value['S'] for key, value in attribute['M'].items()}
+    details['customer_reviews'] = orjson.loads(details['customer_reviews'])
+    return details
+
 @app.route('/api/idea-details', methods=['POST'])
 def get_idea_details():
     data = request.json
@@ -1143,141 +1992,110 @@ def get_idea_details():
         return jsonify({'error': 'Title and item_type are required'}), 400
 
     def generate():
-            # Check if details already exist in DynamoDB
+            # Check if details already exist in DynamoDB; only the details attribute is needed,
+            # not the item's (possibly inline) image
             response = DYNAMODB_CLIENT.get_item(
                 TableName=IDEA_ITEMS_TABLE_NAME,
                 Key={
                     'item_type': {'S': item_type.lower()},
                     'title': {'S': title}
-                }
+                },
+                ProjectionExpression='details'
             )
             
             existing_item = response.get('Item')
             if existing_item and 'details' in existing_item:
-                print("Details exist")
+                logger.info("Details exist")
                 # If details exist, return them immediately
-                details = json.loads(existing_item['details']['S'])
-                print(f"Details: {details}")
-                yield f"data: {json.dumps({'type': 'press_release_start'})}\n\n"
-                yield f"data: {json.dumps({'type': 'press_release', 'content': details['press_release']})}\n\n"
-                yield f"data: {json.dumps({'type': 'press_release_end'})}\n\n"
-                yield f"data: {json.dumps({'type': 'social_media_start'})}\n\n"
-                yield f"data: {json.dumps({'type': 'social_media', 'content': details['social_media_post']})}\n\n"
-                yield f"data: {json.dumps({'type': 'social_media_end'})}\n\n"
-                yield f"data: {json.dumps({'type': 'customer_reviews_start'})}\n\n"
-                yield f"data: {json.dumps({'type': 'customer_reviews', 'content': details['customer_reviews']})}\n\n"
-                yield f"data: {json.dumps({'type': 'customer_reviews_end'})}\n\n"
-                yield f"data: {json.dumps({'type': 'stop'})}\n\n"
+                details = load_details(existing_item['details'])
+                logger.debug("Details: %s", details)
+                yield SECTION_FRAMES['press_release', 'start']
+                yield sse({'type': 'press_release', 'content': details['press_release']})
+                yield SECTION_FRAMES['press_release', 'end']
+                yield SECTION_FRAMES['social_media', 'start']
+                yield sse({'type': 'social_media', 'content': details['social_media_post']})
+                yield SECTION_FRAMES['social_media', 'end']
+                yield SECTION_FRAMES['customer_reviews', 'start']
+                yield sse({'type': 'customer_reviews', 'content': details['customer_reviews']})
+                yield SECTION_FRAMES['customer_reviews', 'end']
+                yield STOP_FRAME
                 return
 
-            # Generate Press Release
-            press_release_prompt = f"""Create a press release for the product idea titled "{title}" with description "{description}"
+            customer_info = get_customer_info()
 
-            The product is being offered by {customer_name}. Here is some additional information about the company: {customer_info} 
-            
-            Format the press release using markdown, including appropriate headers, paragraphs, and emphasis where needed.
-
-            The current date is {datetime.now().strftime("%B %d, %Y")}.
-            
-            Do not include any framing language such as "According to the context" or "Here is an overview of" in your responses, just get straight to the point!
-             """
-            press_release_response = BEDROCK_CLIENT.converse_stream(
-                modelId=good_model_id,
-                system=[{"text": system_prompt}],
-                messages=[{"role": "user", "content": [{"text": press_release_prompt}]}],
-                inferenceConfig={"maxTokens": 1000, "temperature": 0.7, "topP": 1},
+            # Generate Press Release, Social Media Post and Customer Reviews
+            press_release_prompt = PRESS_RELEASE_TEMPLATE.format(
+                title=title, description=description, customer_info=customer_info,
+                date=datetime.now().strftime("%B %d, %Y")
             )
+            social_media_prompt = SOCIAL_MEDIA_TEMPLATE.format(title=title, description=description, customer_info=customer_info)
+            reviews_prompt = REVIEWS_TEMPLATE.format(title=title, description=description)
+            logger.debug("Reviews prompt: %s", reviews_prompt)
+
+            # The three sections are independent, so generate them concurrently and
+            # interleave their output; the client renders each section separately. Each
+            # section ends with None, and closing the stream stops the readers
+            streams = {
+                'press_release': stream_converse_text(
+                    modelId=good_model_id,
+                    system=[{"text": system_prompt}],
+                    messages=[{"role": "user", "content": [{"text": press_release_prompt}]}],
+                    inferenceConfig={"maxTokens": 1000, "temperature": 0.7, "topP": 1},
+                ),
+                'social_media': stream_converse_text(
+                    modelId=fast_model_id,
+                    system=[{"text": system_prompt}],
+                    messages=[{"role": "user", "content": [{"text": social_media_prompt}]}],
+                    inferenceConfig={"maxTokens": 300, "temperature": 0.7, "topP": 1},
+                ),
+                # Using fast_model_id for quicker generation; the reviews array is parsed as it
+                # streams, so this section yields the text of one review at a time
+                'customer_reviews': stream_json_array_items(stream_converse_text(
+                    modelId=fast_model_id,
+                    system=[{"text": system_prompt}],
+                    messages=[{"role": "user", "content": [{"text": reviews_prompt}]}],
+                    inferenceConfig={"maxTokens": 1000, "temperature": 0.7, "topP": 1},
+                )),
+            }
 
             press_release = ""
-            yield f"data: {json.dumps({'type': 'press_release_start'})}\n\n"
-            for chunk in press_release_response["stream"]:
-                if "contentBlockDelta" in chunk:
-                    text = chunk["contentBlockDelta"]["delta"]["text"]
-                    press_release += text
-                    yield f"data: {json.dumps({'type': 'press_release', 'content': text})}\n\n"
-            yield f"data: {json.dumps({'type': 'press_release_end'})}\n\n"
-
-            # Generate Social Media Post
-            social_media_prompt = f"""Create a fun and engaging social media post for the product idea titled "{title}" with description "{description}" 
-            
-            The product is being offered by {customer_name}. Here is some additional information about the company: {customer_info} 
-            Format the social media post using markdown, including appropriate emphasis and line breaks. Use emojis and hashtags where appropriate.
-            
-            Do not include any preamble language such as "Here is an overview of" in your responses, just get straight to the point!
-            """
-            social_media_response = BEDROCK_CLIENT.converse_stream(
-                modelId=fast_model_id,
-                system=[{"text": system_prompt}],
-                messages=[{"role": "user", "content": [{"text": social_media_prompt}]}],
-                inferenceConfig={"maxTokens": 300, "temperature": 0.7, "topP": 1},
-            )
-
             social_media_post = ""
-            yield f"data: {json.dumps({'type': 'social_media_start'})}\n\n"
-            for chunk in social_media_response["stream"]:
-                if "contentBlockDelta" in chunk:
-                    text = chunk["contentBlockDelta"]["delta"]["text"]
-                    social_media_post += text
-                    yield f"data: {json.dumps({'type': 'social_media', 'content': text})}\n\n"
-            yield f"data: {json.dumps({'type': 'social_media_end'})}\n\n"
-
-            # Generate Customer Reviews
-            reviews_prompt = f"""
-            Generate 3-4  positive and realistic customer reviews for the following product idea:
-            Company Name: {customer_name}
-            Product Name: {title}
-            Product Description: {description}
-
-            For each review, provide:
-            1. A customer name (first name and last initial)
-            2. A rating (4 or 5) out of 5 stars
-            3. A positive, realistic comment about the product. The comment should be 2-3 sentences and relate to the 
-                product (and possibly the company)in a real-world context.
-            4. Randomly decide if it's a verified purchase (70% chance) or a top reviewer (20% chance)
-
-            Format the response as a JSON array of objects, like so:
-            [
-                {{
-                    "name": "John Doe",
-                    "rating": 5,
-                    "comment": "This product will be a game changer for my business!",
-                    "verified": true/false,
-                    "topReviewer": true/false
-                }}
-            ]
-
-            Ensure the reviews are diverse in opinion.
-
-            Do not include any preamble language such as "According to the context" or "Here is an overview of" in your responses, just get straight to the point!
-            
-            """
-            print(f"Reviews prompt: {reviews_prompt}")
-            
-            # Using fast_model_id for quicker generation
-            reviews_response = BEDROCK_CLIENT.converse(
-                modelId=fast_model_id,
-                system=[{"text": system_prompt}],
-                messages=[{"role": "user", "content": [{"text": reviews_prompt}]}],
-                inferenceConfig={"maxTokens": 1000, "temperature": 0.7, "topP": 1},
+            reviews_json = []
+            yield SECTION_FRAMES['press_release', 'start']
+            yield SECTION_FRAMES['social_media', 'start']
+            yield SECTION_FRAMES['customer_reviews', 'start']
+            sections = interleave(
+                [(section, with_end_marker(stream)) for section, stream in streams.items()],
+                len(streams)
             )
-            yield f"data: {json.dumps({'type': 'customer_reviews_start'})}\n\n"
-            
-            reviews = reviews_response["output"]["message"]["content"][0]["text"]
-            # print(f"Reviews: {reviews}")
-            # parse out the json array from the reviews string that may contain other text
-                # Use regex to find the JSON object in the response
-            json_match = re.search(r'\[.*?\]', reviews, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                print(f"JSON string: {json_str}")
-                reviews_json = json.loads(json_str)
-            else:
-                print("No JSON object found in the response")
-                reviews_json = {}
-
-            yield f"data: {json.dumps({'type': 'customer_reviews', 'content': reviews_json})}\n\n"
+            with closing(sections):
+                for section, text in sections:
+                    if section == 'press_release':
+                        if text is None:
+                            yield SECTION_FRAMES['press_release', 'end']
+                        else:
+                            press_release += text
+                            yield sse({'type': 'press_release', 'content': text})
+                    elif section == 'social_media':
+                        if text is None:
+                            yield SECTION_FRAMES['social_media', 'end']
+                        else:
+                            social_media_post += text
+                            yield sse({'type': 'social_media', 'content': text})
+                    elif text is not None:
+                        logger.debug("JSON string: %s", text)
+                        try:
+                            review = orjson.loads(text)
+                        except orjson.JSONDecodeError as e:
+                            logger.warning("Skipping malformed review %s: %s", text, e)
+                            continue
+                        reviews_json.append(review)
+                        yield sse({'type': 'customer_review', 'content': review})
+                    else:
+                        if not reviews_json:
+                            logger.warning("No JSON object found in the response")
+                        yield SECTION_FRAMES['customer_reviews', 'end']
 
-            yield f"data: {json.dumps({'type': 'customer_reviews_end'})}\n\n"
             # Save details to DynamoDB
             details = {
                 'press_release': press_release,
@@ -1293,14 +2111,14 @@ def get_idea_details():
                         'title': {'S': title}
                     },
                     UpdateExpression='SET details = :details',
-                    ExpressionAttributeValues={':details': {'S': json.dumps(details)}}
+                    ExpressionAttributeValues={':details': dump_details(details)}
                 )
             except Exception as e:
-                print(f"Error updating details in DynamoDB: {str(e)}")
+                logger.error("Error updating details in DynamoDB: %s", e)
 
-            yield f"data: {json.dumps({'type': 'stop'})}\n\n"
+            yield STOP_FRAME
 
-    return Response(generate(), mimetype='text/event-stream')
+    return event_stream(generate())
 # New endpoint to generate customer reviews
 
 if __name__ == '__main__':
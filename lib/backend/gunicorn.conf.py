@@ -0,0 +1,18 @@
+import os
+import threading
+
+# Loaded automatically by gunicorn from the working directory. SSE streams spend nearly all
+# their time waiting on Bedrock, so each one holds a thread rather than a CPU; the number
+# of concurrent streams a task can serve is workers x threads, tunable per deployment
+bind = '0.0.0.0:5000'
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+timeout = 120
+
+def post_worker_init(worker):
+    # Each worker has its own clients and caches, so warm them in the background once the
+    # app is loaded; the worker starts accepting requests right away
+    from app import warm_clients, warm_site_info
+    threading.Thread(target=warm_clients, daemon=True).start()
+    threading.Thread(target=warm_site_info, daemon=True).start()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# app.py reads these at import; dummy values keep it from falling back to .env.local.
+# The tests only exercise pure helpers, so no AWS call is ever made
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("CUSTOMER_NAME", "Test")
+os.environ.setdefault("KNOWLEDGE_BASE_ID", "test-kb")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
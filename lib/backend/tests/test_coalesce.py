@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from app import coalesce
+
+
+def test_coalesce_fills_batches_up_to_max_items():
+    assert list(coalesce(range(9), max_items=4, max_wait=10)) == [[0, 1, 2, 3], [4, 5, 6, 7], [8]]
+
+
+def test_coalesce_flushes_a_partial_batch_when_the_window_expires():
+    def slow():
+        yield 1
+        yield 2
+        time.sleep(0.3)
+        yield 3
+
+    started = time.monotonic()
+    batches = coalesce(slow(), max_items=4, max_wait=0.05)
+    assert next(batches) == [1, 2]
+    assert time.monotonic() - started < 0.25
+    assert list(batches) == [[3]]
+
+
+def test_coalesce_reraises_errors_after_flushing():
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    batches = coalesce(failing(), max_items=4, max_wait=10)
+    assert next(batches) == [1]
+    with pytest.raises(ValueError, match="boom"):
+        next(batches)
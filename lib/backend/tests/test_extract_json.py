@@ -0,0 +1,15 @@
+from app import extract_json
+
+
+def test_extract_json_skips_braces_inside_strings():
+    text = 'Sure! {"summary": "use } and { freely", "nested": {"q": "\\"}\\""}} and more }'
+    assert extract_json(text, '{') == '{"summary": "use } and { freely", "nested": {"q": "\\"}\\""}}'
+
+
+def test_extract_json_finds_arrays():
+    assert extract_json('Questions: ["What is [this]?", "Why?"] done', '[') == '["What is [this]?", "Why?"]'
+
+
+def test_extract_json_returns_none_without_a_balanced_value():
+    assert extract_json('no json here', '{') is None
+    assert extract_json('{"open": "never closed"', '{') is None
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from app import interleave, with_end_marker
+
+
+def test_interleave_tags_items_with_their_stream_key():
+    streams = [('a', with_end_marker(['a1', 'a2'])), ('b', with_end_marker(['b1']))]
+    pairs = list(interleave(streams, 2))
+    assert [item for key, item in pairs if key == 'a'] == ['a1', 'a2', None]
+    assert [item for key, item in pairs if key == 'b'] == ['b1', None]
+
+
+def test_interleave_starts_queued_streams_as_slots_free_up():
+    running = []
+    peak = []
+
+    def stream(key):
+        running.append(key)
+        peak.append(len(running))
+        time.sleep(0.05)
+        yield key
+        running.remove(key)
+
+    pairs = list(interleave(((key, stream(key)) for key in 'abcd'), 2))
+    assert sorted(item for _, item in pairs) == ['a', 'b', 'c', 'd']
+    assert max(peak) <= 2
+
+
+def test_interleave_reraises_stream_errors():
+    def failing():
+        yield 'ok'
+        raise ValueError("section failed")
+
+    pairs = interleave([('a', failing())], 1)
+    assert next(pairs) == ('a', 'ok')
+    with pytest.raises(ValueError, match="section failed"):
+        next(pairs)
+
+
+def test_interleave_close_stops_and_closes_the_streams():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield 'tick'
+        finally:
+            closed.set()
+
+    pairs = interleave([('a', endless())], 1, maxsize=1)
+    assert next(pairs) == ('a', 'tick')
+    pairs.close()
+    assert closed.wait(timeout=5)
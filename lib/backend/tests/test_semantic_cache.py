@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import app
+from app import SemanticCache
+
+MODIFIER = "Informative, empathetic, and friendly"
+
+
+def unit(x, y):
+    vector = np.array([x, y], dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def at_similarity(score):
+    # A unit vector whose cosine similarity with unit(1, 0) is score
+    return unit(score, np.sqrt(1 - score ** 2))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_lookup_hits_above_the_threshold():
+    cache = SemanticCache(0.92, 10, 3600)
+    cache.add(unit(1, 0), MODIFIER, "cached answer")
+    assert cache.lookup(at_similarity(0.93), MODIFIER) == "cached answer"
+
+
+def test_lookup_misses_below_the_threshold():
+    cache = SemanticCache(0.92, 10, 3600)
+    cache.add(unit(1, 0), MODIFIER, "cached answer")
+    assert cache.lookup(at_similarity(0.91), MODIFIER) is None
+
+
+def test_lookup_returns_the_closest_entry():
+    cache = SemanticCache(0.92, 10, 3600)
+    cache.add(at_similarity(0.95), MODIFIER, "close")
+    cache.add(unit(1, 0), MODIFIER, "exact")
+    assert cache.lookup(unit(1, 0), MODIFIER) == "exact"
+
+
+def test_lookup_keeps_prompt_modifiers_apart():
+    cache = SemanticCache(0.92, 10, 3600)
+    cache.add(unit(1, 0), MODIFIER, "friendly answer")
+    assert cache.lookup(unit(1, 0), "Formal") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticCache(0.92, 10, 60)
+    cache.add(unit(1, 0), MODIFIER, "cached answer")
+    clock[0] += 59
+    assert cache.lookup(unit(1, 0), MODIFIER) == "cached answer"
+    clock[0] += 1
+    assert cache.lookup(unit(1, 0), MODIFIER) is None
+
+
+def test_the_least_recently_used_entry_is_evicted_first():
+    cache = SemanticCache(0.92, 2, 3600)
+    cache.add(unit(1, 0), MODIFIER, "first")
+    cache.add(unit(0, 1), MODIFIER, "second")
+    # The hit makes "first" the most recently used, so "second" goes when "third" arrives
+    assert cache.lookup(unit(1, 0), MODIFIER) == "first"
+    cache.add(unit(-1, 0), MODIFIER, "third")
+    assert cache.lookup(unit(0, 1), MODIFIER) is None
+    assert cache.lookup(unit(1, 0), MODIFIER) == "first"
+    assert cache.lookup(unit(-1, 0), MODIFIER) == "third"
+
+
+def test_clear_drops_every_entry():
+    cache = SemanticCache(0.92, 10, 3600)
+    cache.add(unit(1, 0), MODIFIER, "cached answer")
+    cache.clear()
+    assert cache.lookup(unit(1, 0), MODIFIER) is None
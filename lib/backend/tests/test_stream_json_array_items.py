@@ -0,0 +1,29 @@
+from app import stream_json_array_items
+
+
+def test_stream_json_array_items_joins_objects_split_across_chunks():
+    chunks = ['Here you go: [{"title": "Gran', 'ola"}, {"title"', ': "Pie", "tags": ["a", {"b"', ': 1}]}', '] Enjoy!']
+    assert list(stream_json_array_items(chunks)) == [
+        '{"title": "Granola"}',
+        '{"title": "Pie", "tags": ["a", {"b": 1}]}',
+    ]
+
+
+def test_stream_json_array_items_ignores_brackets_and_escaped_quotes_in_strings():
+    chunks = ['[{"text": "a } or ] and a \\"', 'quoted {brace}\\" here"}, {"n": 2}]']
+    assert list(stream_json_array_items(chunks)) == [
+        '{"text": "a } or ] and a \\"quoted {brace}\\" here"}',
+        '{"n": 2}',
+    ]
+
+
+def test_stream_json_array_items_yields_each_item_before_the_stream_ends():
+    def chunks():
+        yield '[{"a": 1}, '
+        raise AssertionError("read past the first item")
+
+    assert next(stream_json_array_items(chunks())) == '{"a": 1}'
+
+
+def test_stream_json_array_items_stops_at_the_end_of_the_first_array():
+    assert list(stream_json_array_items(['[{"a": 1}] then [{"b": 2}]'])) == ['{"a": 1}']
@@ -71,7 +71,7 @@ const Catalog: React.FC<CatalogProps> = ({ siteName, initialPrompt, onPromptSave
       setCards([]); // Reset cards when starting a new fetch
       try {
         const promptToUse = savedPrompt || initialPrompt;
-        const response = await fetch(`${backendUrl}/site-items?prompt=${encodeURIComponent(promptToUse)}&item_type=${encodeURIComponent(itemType)}&limit=${itemLimit}&generate_images=${generateImages}`);
+        const response = await fetch(`${backendUrl}/site-items?prompt=${encodeURIComponent(promptToUse)}&item_type=${encodeURIComponent(itemType)}&limit=${itemLimit}&generate_images=${generateImages}&batch=true`);
         if (!response.ok) {
           throw new Error('Failed to fetch site items');
         }
@@ -80,11 +80,20 @@ const Catalog: React.FC<CatalogProps> = ({ siteName, initialPrompt, onPromptSave
 
         let partialData = '';
 
+        // Batched events carry an array of cards, unbatched ones a single card
+        const addCards = (data: CardData | CardData[]) => {
+          const incoming = Array.isArray(data) ? data : [data];
+          setCards(prevCards => {
+            const newCards = incoming.filter(card => !prevCards.some(prevCard => prevCard.title === card.title));
+            return newCards.length ? [...prevCards, ...newCards] : prevCards;
+          });
+        };
+
         while (true) {
           const { done, value } = await reader.read();
           if (done) break;
 
-          const chunk = decoder.decode(value);
+          const chunk = decoder.decode(value, { stream: true });
           const lines = (partialData + chunk).split('\n');
           partialData = lines.pop() || '';
           
@@ -95,12 +104,7 @@ const Catalog: React.FC<CatalogProps> = ({ siteName, initialPrompt, onPromptSave
                 if (data.type === 'stop') {
                   setLoading(false);
                 } else {
-                  setCards(prevCards => {
-                    if (prevCards.some(card => card.title === data.title)) {
-                      return prevCards;
-                    }
-                    return [...prevCards, data];
-                  });
+                  addCards(data);
                 }
               } catch (error) {
                 console.warn('Incomplete JSON, waiting for more data');
@@ -114,12 +118,7 @@ const Catalog: React.FC<CatalogProps> = ({ siteName, initialPrompt, onPromptSave
           try {
             const data = JSON.parse(partialData.slice(6));
             if (data.type !== 'stop') {
-              setCards(prevCards => {
-                if (prevCards.some(card => card.title === data.title)) {
-                  return prevCards;
-                }
-                return [...prevCards, data];
-              });
+              addCards(data);
             }
           } catch (error) {
             console.error('Error parsing final SSE data:', error);
@@ -342,7 +341,7 @@ const Catalog: React.FC<CatalogProps> = ({ siteName, initialPrompt, onPromptSave
                     <CardMedia
                       component="img"
                       height="140"
-                      image={`data:image/png;base64,${card.image}`}
+                      image={card.image.startsWith('/images/') ? card.image : `data:image/png;base64,${card.image}`}
                       alt={card.title}
                       />
                     )}
@@ -167,14 +167,17 @@ const ChatBot: React.FC<ChatBotProps> = ({ backendUrl, customerName }) => {
 
       const reader = response.body!.getReader();
       const decoder = new TextDecoder();
+      let partialData = '';
       let botMessage: Message = { text: '', isUser: false };
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n\n');
+        const chunk = decoder.decode(value, { stream: true });
+        // Keep a trailing partial event until the rest of it arrives
+        const lines = (partialData + chunk).split('\n\n');
+        partialData = lines.pop() || '';
         for (const line of lines) {
           if (line.startsWith('data: ')) {
             try {
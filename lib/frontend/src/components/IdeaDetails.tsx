@@ -94,6 +94,7 @@ const IdeaDetails: React.FC<IdeaDetailsProps> = ({ backendUrl, customerName }) =
 
         const reader = response.body?.getReader();
         const decoder = new TextDecoder();
+        let partialData = '';
 
         if (reader) {
           let pressReleaseBuffer = '';
@@ -103,8 +104,10 @@ const IdeaDetails: React.FC<IdeaDetailsProps> = ({ backendUrl, customerName }) =
             const { done, value } = await reader.read();
             if (done) break;
 
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n\n');
+            const chunk = decoder.decode(value, { stream: true });
+            // Keep a trailing partial event until the rest of it arrives
+            const lines = (partialData + chunk).split('\n\n');
+            partialData = lines.pop() || '';
 
             for (const line of lines) {
               if (line.startsWith('data: ')) {
@@ -137,6 +140,10 @@ const IdeaDetails: React.FC<IdeaDetailsProps> = ({ backendUrl, customerName }) =
                     case 'customer_reviews':
                       setCustomerReviews(data.content);
                       break;
+                    case 'customer_review':
+                      // Freshly generated reviews arrive one at a time
+                      setCustomerReviews(prev => [...prev, data.content]);
+                      break;
                     case 'customer_reviews_end':
                       setLoadingReviews(false);
                       break;
@@ -234,7 +241,7 @@ const IdeaDetails: React.FC<IdeaDetailsProps> = ({ backendUrl, customerName }) =
                     <ReactMarkdown>{socialMediaPost}</ReactMarkdown>
                     {ideaItem.image && (
                       <Box sx={{ mt: 2, mb: 2 }}>
-                        <img src={`data:image/jpeg;base64,${ideaItem.image}`} alt="Idea visualization" style={{ width: '100%', borderRadius: '12px' }} />
+                        <img src={ideaItem.image.startsWith('/images/') ? ideaItem.image : `data:image/jpeg;base64,${ideaItem.image}`} alt="Idea visualization" style={{ width: '100%', borderRadius: '12px' }} />
                       </Box>
                     )}
                   </>
@@ -263,7 +270,7 @@ const IdeaDetails: React.FC<IdeaDetailsProps> = ({ backendUrl, customerName }) =
               Customer Review Preview
             </Box>} />
             <CardContent>
-              {loadingReviews ? (
+              {loadingReviews && customerReviews.length === 0 ? (
                 <Box>
                   <Skeleton variant="text" width="80%" />
                   <Skeleton variant="text" width="60%" />
@@ -81,7 +81,7 @@ const Ideator: React.FC<IdeatorProps> = ({ backendUrl, ideaName, initialPrompt,
           const { done, value } = await reader.read();
           if (done) break;
 
-          const chunk = decoder.decode(value);
+          const chunk = decoder.decode(value, { stream: true });
           const lines = (partialData + chunk).split('\n');
           partialData = lines.pop() || '';
           
@@ -336,7 +336,7 @@ const Ideator: React.FC<IdeatorProps> = ({ backendUrl, ideaName, initialPrompt,
                 <CardMedia
                   component="img"
                   height="140"
-                  image={`data:image/png;base64,${idea.image}`}
+                  image={idea.image.startsWith('/images/') ? idea.image : `data:image/png;base64,${idea.image}`}
                   alt={idea.title}
                 />
               )}
@@ -1,8 +1,9 @@
 import boto3
 import time
 from botocore.exceptions import ClientError
+from botocore.config import Config
 
-bedrock_agent = boto3.client('bedrock-agent')
+bedrock_agent = boto3.client('bedrock-agent', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
 
 def lambda_handler(event, context):
     if event['RequestType'] == 'Create':
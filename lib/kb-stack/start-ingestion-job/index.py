@@ -1,10 +1,12 @@
 import boto3
 import json
 import os
+from botocore.config import Config
+
+# Created once per execution environment so warm invocations reuse the connection
+bedrock_agent = boto3.client('bedrock-agent', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
 
 def lambda_handler(event, context):
-    bedrock_agent = boto3.client('bedrock-agent')
-    
     try:
         if event['RequestType'] in ['Create', 'Update']:
             response = bedrock_agent.start_ingestion_job(
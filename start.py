@@ -1,66 +1,197 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import functools
+import hashlib
 import subprocess
 import sys
+import tempfile
 import json
 import os
+import pathlib
+import re
 import shutil
 import threading
 import time
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
 # -- Removed base64 import since bodies are sent as plain JSON
 
+def _json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _write_json(path, obj, indent=True):
+    if orjson:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    else:
+        data = json.dumps(obj, indent=2 if indent else None).encode()
+    try:
+        with open(path, 'rb') as f:
+            unchanged = f.read() == data
+    except FileNotFoundError:
+        unchanged = False
+    # Leave an identical file untouched so its mtime, and the read cache, stay valid
+    if not unchanged:
+        with open(path, 'wb') as f:
+            f.write(data)
+    # We just wrote obj, so seed the read cache instead of re-parsing it later
+    _json_cache[path] = (os.stat(path).st_mtime_ns, obj)
+
+# Parsed JSON files keyed by path, holding (st_mtime_ns, data) so repeat reads
+# of an unchanged file skip the disk read and the parse.
+_json_cache = {}
+
+def _cached_json(path):
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _json_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, 'rb') as f:
+        data = _json_loads(f.read())
+    _json_cache[path] = (mtime_ns, data)
+    return data
+
+# PATH lookups are memoized; PATH doesn't change while the script runs
+which = functools.lru_cache(maxsize=None)(shutil.which)
+
+# The dependency checks run concurrently; their output goes through log() so
+# lines from different checks don't interleave.
+_print_lock = threading.Lock()
+
+def log(message):
+    with _print_lock:
+        print(message)
+
+# Successful CDK CLI and Docker checks are remembered for PRECHECKS_TTL seconds
+# so repeated runs skip them; --force re-runs every check.
+PRECHECKS_CACHE_FILE = '.prechecks_cache.json'
+PRECHECKS_TTL = 3600
+_prechecks_lock = threading.Lock()
+
+def _load_prechecks():
+    try:
+        return _cached_json(PRECHECKS_CACHE_FILE)
+    except (OSError, ValueError):
+        return {}
+
+def precheck_is_cached(name, force=False):
+    checked_at = None if force else _load_prechecks().get(name)
+    return checked_at is not None and time.time() - checked_at < PRECHECKS_TTL
+
+def record_precheck(name):
+    with _prechecks_lock:
+        prechecks = dict(_load_prechecks())
+        prechecks[name] = time.time()
+        _write_json(PRECHECKS_CACHE_FILE, prechecks, indent=False)
+
+CUSTOMERS_DIR = pathlib.Path('customers')
+
+def customer_file(customer_name):
+    return CUSTOMERS_DIR / f"{customer_name}.json"
+
 def check_customers_dir():
-    if not os.path.exists('customers'):
+    if not CUSTOMERS_DIR.exists():
         print("📂 Creating customers directory...")
-        os.makedirs('customers')
+        CUSTOMERS_DIR.mkdir()
 
-def npm_install():
-    run_command("npm install")
+# Hash of package.json and package-lock.json as of the last successful
+# npm install; it lives in node_modules so deleting that forces a reinstall.
+NPM_INSTALL_SENTINEL = os.path.join('node_modules', '.npm_install_sentinel')
 
-def check_cdk_cli():
-    if shutil.which('cdk') is None:
-        print("    ❌ CDK CLI is not found in your system PATH.")
-        print("Please install the AWS CDK CLI by following the instructions at:")
-        print("    🔗 https://docs.aws.amazon.com/cdk/v2/guide/cli.html")
-        print("    After installation, restart your terminal and run this script again.")
+def _npm_manifest_hash():
+    digest = hashlib.blake2b(digest_size=16)
+    for manifest in ('package.json', 'package-lock.json'):
+        try:
+            with open(manifest, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            pass
+    return digest.hexdigest()
+
+def npm_install(force=False):
+    if not force:
+        try:
+            with open(NPM_INSTALL_SENTINEL) as f:
+                if f.read() == _npm_manifest_hash():
+                    print("📦 npm dependencies are up to date.")
+                    return
+        except FileNotFoundError:
+            pass
+    print("📦 Installing npm dependencies...")
+    # Reuse packages from the local npm cache rather than revalidating them online
+    run_command(["npm", "install", "--prefer-offline"])
+    # npm install may rewrite package-lock.json, so hash it afterwards
+    os.makedirs('node_modules', exist_ok=True)
+    with open(NPM_INSTALL_SENTINEL, 'w') as f:
+        f.write(_npm_manifest_hash())
+
+def check_cdk_cli(force=False):
+    if precheck_is_cached('cdk', force):
+        log("    ✅ Using cached CDK CLI check.")
+        return
+    if which('cdk') is None:
+        log("    ❌ CDK CLI is not found in your system PATH.")
+        log("Please install the AWS CDK CLI by following the instructions at:")
+        log("    🔗 https://docs.aws.amazon.com/cdk/v2/guide/cli.html")
+        log("    After installation, restart your terminal and run this script again.")
         sys.exit(1)
-    print("    ✅ CDK CLI is found in your system PATH.")
-
-def check_docker():
-    if shutil.which('docker') is None:
-        print("    ❌ Docker is not found in your system PATH.")
-        print("Please install Docker by following the instructions at:")
-        print("    🔗 https://docs.docker.com/get-docker/")
-        print("After installation, restart your terminal and run this script again.")
+    log("    ✅ CDK CLI is found in your system PATH.")
+    record_precheck('cdk')
+
+def check_docker(force=False):
+    if precheck_is_cached('docker', force):
+        log("    ✅ Using cached Docker check.")
+        return
+    if which('docker') is None:
+        log("    ❌ Docker is not found in your system PATH.")
+        log("Please install Docker by following the instructions at:")
+        log("    🔗 https://docs.docker.com/get-docker/")
+        log("After installation, restart your terminal and run this script again.")
         sys.exit(1)
-    print("    ✅ Docker is found in your system PATH.")
+    log("    ✅ Docker is found in your system PATH.")
+    record_precheck('docker')
 
 def run_command(command):
     try:
-        command_list = command if isinstance(command, list) else command.split()
-        print(f"🚀 Running command: {' '.join(command_list)}")
-        subprocess.run(command_list, check=True)
+        print(f"🚀 Running command: {' '.join(command)}")
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         print(f"❌ Error executing command: {e}")
         sys.exit(1)
 
+_STACK_SUFFIX = {"app": "AppStack", "kb": "KBStack"}
+
+def stack_name(stack):
+    suffix = _STACK_SUFFIX.get(stack)
+    if suffix is None:
+        print("❌ Invalid stack option. Please choose 'app' or 'kb'.")
+        return None
+    # Same prefix as bin/kb-demo.ts, which drops non-word characters
+    prefix = re.sub(r'\W', '', load_context()['customerName'], flags=re.ASCII)
+    return f"KB-{prefix}-{suffix}"
+
 def deploy(stack=None):
     print("🚀 Deploying CDK stack...")
-    context = load_context()
-    command = "cdk deploy"
+    command = ["cdk", "deploy"]
     if stack:
-        if stack == "app":
-            stack_name = f"KB-{context['customerName']}-AppStack"
-        elif stack == "kb":
-            stack_name = f"KB-{context['customerName']}-KBStack"
-        else:
-            print("❌ Invalid stack option. Please choose 'app' or 'kb'.")
+        name = stack_name(stack)
+        if name is None:
             return
-        command += f" {stack_name}"
+        command.append(name)
     else:
-        command += " --all"
-    command += " --require-approval never"
+        # Let CDK build and publish the App stack's assets while the KB stack
+        # deploys instead of running every step back to back
+        command += [
+            "--all",
+            "--concurrency", os.environ.get("CDK_CONCURRENCY", "4"),
+            "--asset-parallelism",
+            "--asset-prebuild=false",
+        ]
+    command += ["--require-approval", "never"]
     print(f"    Deploying {'all stacks' if not stack else stack}...")
     run_command(command)
     print("""✅ Stack deployed successfully! You can use the above DemoFrontendURL to access the demo.
@@ -73,38 +204,39 @@ def deploy(stack=None):
 )
 
 def destroy(stack=None):
-    context = load_context()
-    command = "cdk destroy"
+    command = ["cdk", "destroy"]
     if stack:
-        if stack == "app":
-            stack_name = f"KB-{context['customerName']}-AppStack"
-        elif stack == "kb":
-            stack_name = f"KB-{context['customerName']}-KBStack"
-        else:
-            print("❌ Invalid stack option. Please choose 'app' or 'kb'.")
+        name = stack_name(stack)
+        if name is None:
             return
-        command += f" {stack_name}"
+        command.append(name)
     else:
-        command += " --all"
+        command.append("--all")
     print(f"💥 Destroying {'all stacks' if not stack else stack}...")
     run_command(command)
 
 def synth(stack=None):
-    command = "cdk synth"
+    command = ["cdk", "synth"]
     if stack:
-        command += f" {stack}"
+        name = stack_name(stack)
+        if name is None:
+            return
+        command.append(name)
     run_command(command)
 
 def check_context_file(customer_name):
-    context_file = os.path.join('customers', f"{customer_name}.json")
+    context_file = customer_file(customer_name)
     required_keys = ['scrapeUrls', 'customerName', 'customerIndustry']
 
-    if not os.path.exists(context_file) or os.path.getsize(context_file) == 0:
+    try:
+        empty = os.stat(context_file).st_size == 0
+    except FileNotFoundError:
+        empty = True
+    if empty:
         print(f"⛔️ Context file for {customer_name} is missing or empty. Let's set it up!")
         create_context_file({}, customer_name)
     else:
-        with open(context_file, 'r') as f:
-            context = json.load(f)
+        context = _cached_json(context_file)
         if not all(key in context and context[key] for key in required_keys):
             print(f"⛔️ Context file for {customer_name} is incomplete. Let's update it!")
             create_context_file(context, customer_name)
@@ -124,28 +256,28 @@ def create_context_file(existing_context, customer_name):
     context['customerName'] = customer_name
     context['customerIndustry'] = get_input('customerIndustry', "    Enter customer industry")
 
-    os.makedirs('customers', exist_ok=True)
-    with open(os.path.join('customers', f"{customer_name}.json"), 'w') as f:
-        json.dump(context, f, indent=2)
+    _write_json(customer_file(customer_name), context)
     print(f"✅ Context file for {customer_name} has been created/updated successfully!")
 
 def load_customer_context(customer_name):
-    customer_file = os.path.join('customers', f"{customer_name}.json")
-    if not os.path.exists(customer_file):
+    try:
+        context = _cached_json(customer_file(customer_name))
+    except FileNotFoundError:
         print(f"❌ Customer {customer_name} does not exist.")
         sys.exit(1)
-    with open(customer_file, 'r') as f:
-        context = json.load(f)
-    with open('cdk.context.json', 'w') as f:
-        json.dump(context, f, indent=2)
+    # A generated copy of the customer file, so it is written compactly
+    _write_json('cdk.context.json', context, indent=False)
     print(f"✅ Loaded context for customer: {customer_name}")
 
 def list_customers():
-    customers_dir = 'customers'
-    if not os.path.exists(customers_dir):
+    if not CUSTOMERS_DIR.exists():
         print("📂 No customers found.")
         return
-    customers = [f.split('.')[0] for f in os.listdir(customers_dir) if f.endswith('.json')]
+    # The Bedrock models check cache lives alongside the customer files
+    customers = sorted(
+        path.stem for path in CUSTOMERS_DIR.glob('*.json')
+        if path != MODELS_CHECK_FILE
+    )
     if not customers:
         print("📂 No customers found.")
     else:
@@ -158,128 +290,180 @@ def create_customer():
     if not customer_name:
         print("❌ Customer name cannot be empty.")
         return
-    customer_file = os.path.join('customers', f"{customer_name}.json")
-    if os.path.exists(customer_file):
+    if customer_file(customer_name).exists():
         print(f"❌ Customer {customer_name} already exists.")
         return
     create_context_file({}, customer_name)
     print(f"✅ Customer {customer_name} created successfully.")
 
 def load_context():
-    with open('cdk.context.json', 'r') as f:
-        return json.load(f)
-
-def check_bedrock_models():
-    models_check_file = os.path.join('customers', "bedrock_models_check.json")
-    if os.path.exists(models_check_file):
-        with open(models_check_file, 'r') as f:
-            check_data = json.load(f)
-        if check_data and all(status == "available" for status in check_data.values()):
-            print("    ✅ Using cached Bedrock models check. All required models are available.")
-            return
+    return _cached_json('cdk.context.json')
+
+# Only written once every required model has been invoked successfully, so its
+# existence alone means the check passed.
+MODELS_CHECK_FILE = CUSTOMERS_DIR / "bedrock_models_check.json"
+REQUIRED_MODELS = (
+    "anthropic.claude-3-sonnet-20240229-v1:0",
+    "anthropic.claude-3-haiku-20240307-v1:0",
+    "amazon.titan-image-generator-v2:0"
+)
 
-    print("🔍 Checking for required Bedrock models...")
-    required_models = [
-        "anthropic.claude-3-sonnet-20240229-v1:0",
-        "anthropic.claude-3-haiku-20240307-v1:0",
-        "amazon.titan-image-generator-v2:0"
+# Fixed request bodies for the AWS CLI invoke-model probes
+_CLAUDE_PROBE_BODY = json.dumps({
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": 10,
+    "messages": [
+        {"role": "user", "content": [{"type": "text", "text": "Hello"}]}
     ]
-    models_status = {}
-    for model_id in required_models:
-        print(f"  Testing model: {model_id}")
-        try:
-            if "claude" in model_id:
-                # Use updated Claude prompt format without base64
-                body = json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 10,
-                    "messages": [
-                        {"role": "user", "content": [{"type": "text", "text": "Hello"}]} 
-                    ]
-                })
-            elif "titan-image-generator" in model_id:
-                # Use plain JSON for image generator payload
-                body = json.dumps({
-                    "taskType": "TEXT_IMAGE",
-                    "textToImageParams": {
-                        "text": "A simple test image",
-                        "negativeText": "blurry, distorted, low quality",
-                    },
-                    "imageGenerationConfig": {
-                        "quality": "standard",
-                        "width": 512,
-                        "height": 512,
-                        "numberOfImages": 1,
-                        "cfgScale": 8.0,
-                        "seed": 42
-                    }
-                })
-
-            # Invoke the model with plain JSON body
-            command = [
-                "aws", "bedrock-runtime", "invoke-model",
-                "--model-id", model_id,
-                "--body", body,
-                "--content-type", "application/json",
-                "--region", "us-east-1",
-                "--output", "json",
-                "output.txt"
-            ]
-            result = subprocess.run(command, capture_output=True, text=True, check=True)
-            if result.returncode == 0:
-                print(f"    ✅ Model {model_id} is available and functioning.")
-                models_status[model_id] = "available"
-            else:
-                print(f"    ❌ Error invoking model {model_id}: {result.stderr}")
-                models_status[model_id] = "error"
-        except subprocess.CalledProcessError as e:
-            print(f"    ❌ Error invoking model {model_id}: {e.stderr}")
-            models_status[model_id] = "error"
+})
+_TITAN_IMAGE_PROBE_BODY = json.dumps({
+    "taskType": "TEXT_IMAGE",
+    "textToImageParams": {
+        "text": "A simple test image",
+        "negativeText": "blurry, distorted, low quality",
+    },
+    "imageGenerationConfig": {
+        "quality": "standard",
+        "width": 512,
+        "height": 512,
+        "numberOfImages": 1,
+        "cfgScale": 8.0,
+        "seed": 42
+    }
+})
+PROBE_BODIES = {
+    model_id: _CLAUDE_PROBE_BODY if "claude" in model_id else _TITAN_IMAGE_PROBE_BODY
+    for model_id in REQUIRED_MODELS
+}
+
+@functools.lru_cache(maxsize=None)
+def aws_session():
+    # One session for every in-process AWS call, so credentials are resolved once.
+    # boto3 is slow to import, so it is only loaded once an AWS call is needed.
+    try:
+        import boto3
+    except ImportError:  # without boto3 the AWS calls go through the AWS CLI
+        return None
+    return boto3.Session(region_name="us-east-1")
+
+def check_model_access(bedrock, model_id):
+    # A metadata lookup, so no billed inference or image generation is needed
+    from botocore.exceptions import BotoCoreError, ClientError
+    log(f"  Checking model access: {model_id}")
+    try:
+        availability = bedrock.get_foundation_model_availability(modelId=model_id)
+    except (BotoCoreError, ClientError) as e:
+        log(f"    ❌ Error checking model {model_id}: {e}")
+        return "error"
+    if (availability["authorizationStatus"] == "AUTHORIZED"
+            and availability["entitlementAvailability"] == "AVAILABLE"
+            and availability["regionAvailability"] == "AVAILABLE"):
+        log(f"    ✅ Model {model_id} is available.")
+        return "available"
+    log(f"    ❌ Model {model_id} is not enabled for this account.")
+    return "error"
+
+def probe_model(model_id, output_path):
+    log(f"  Testing model: {model_id}")
+    try:
+        # Invoke the model with plain JSON body
+        command = [
+            "aws", "bedrock-runtime", "invoke-model",
+            "--model-id", model_id,
+            "--body", PROBE_BODIES[model_id],
+            # AWS CLI v2 expects blob arguments base64-encoded unless told otherwise
+            "--cli-binary-format", "raw-in-base64-out",
+            "--content-type", "application/json",
+            "--region", "us-east-1",
+            "--output", "json",
+            output_path
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        if result.returncode == 0:
+            log(f"    ✅ Model {model_id} is available and functioning.")
+            return "available"
+        log(f"    ❌ Error invoking model {model_id}: {result.stderr}")
+        return "error"
+    except subprocess.CalledProcessError as e:
+        log(f"    ❌ Error invoking model {model_id}: {e.stderr}")
+        return "error"
+
+def check_bedrock_models(force=False):
+    if not force and MODELS_CHECK_FILE.exists():
+        log("    ✅ Using cached Bedrock models check. All required models are available.")
+        return
+
+    log("🔍 Checking for required Bedrock models...")
+    session = aws_session()
+    bedrock = session.client("bedrock") if session else None
+    with tempfile.TemporaryDirectory() as output_dir, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=len(REQUIRED_MODELS)) as executor:
+        if hasattr(bedrock, "get_foundation_model_availability"):
+            statuses = executor.map(lambda model_id: check_model_access(bedrock, model_id), REQUIRED_MODELS)
+        else:
+            # Without boto3, or with a botocore too old for the availability API,
+            # invoke each model through the AWS CLI. Each probe writes its
+            # response to its own file so they don't clobber each other.
+            probes = [(model_id, os.path.join(output_dir, f"output_{i}.txt")) for i, model_id in enumerate(REQUIRED_MODELS)]
+            statuses = executor.map(lambda probe: probe_model(*probe), probes)
+        models_status = dict(zip(REQUIRED_MODELS, statuses))
 
     if all(status == "available" for status in models_status.values()):
-        with open(models_check_file, 'w') as f:
-            json.dump(models_status, f)
-        print("    ✅ All required Bedrock models are available and functioning.")
+        MODELS_CHECK_FILE.touch()
+        log("    ✅ All required Bedrock models are available.")
     else:
-        print("    ❌ Some required Bedrock models are not available.")
-        print("Please ensure you have access to these models in the us-east-1 region.")
-        print("🔗 https://docs.aws.amazon.com/bedrock/latest/userguide/model-access-modify.html")
+        log("    ❌ Some required Bedrock models are not available.")
+        log("Please ensure you have access to these models in the us-east-1 region.")
+        log("🔗 https://docs.aws.amazon.com/bedrock/latest/userguide/model-access-modify.html")
         sys.exit(1)
 
 def run_process(command, working_dir, prefix):
-    current_dir = os.getcwd()
-    os.chdir(working_dir)
-    try:
-        command_list = command if isinstance(command, list) else command.split()
-        print(f"🚀 Running process: {' '.join(command_list)}")
-        process = subprocess.Popen(
-            command_list,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-        for line in iter(process.stdout.readline, ''):
-            sys.stdout.write(f"{prefix}: {line}")
-            sys.stdout.flush()
-    finally:
-        os.chdir(current_dir)
+    command_list = command if isinstance(command, list) else command.split()
+    print(f"🚀 Running process: {' '.join(command_list)}")
+    sys.stdout.flush()
+    process = subprocess.Popen(
+        command_list,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=working_dir
+    )
+    # Relay the output in raw chunks, prefixing each line, rather than
+    # reading and writing it one line at a time
+    fd = process.stdout.fileno()
+    line_prefix = f"{prefix}: ".encode()
+    out = sys.stdout.buffer
+    at_line_start = True
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            break
+        if at_line_start:
+            out.write(line_prefix)
+        at_line_start = chunk.endswith(b"\n")
+        if at_line_start:
+            out.write(chunk[:-1].replace(b"\n", b"\n" + line_prefix) + b"\n")
+        else:
+            out.write(chunk.replace(b"\n", b"\n" + line_prefix))
+        out.flush()
+    process.wait()
 
 def main():
-    print("🔍 Checking for required dependencies...")
-    check_customers_dir()
-    check_cdk_cli()
-    check_docker()
-    check_bedrock_models()
-
     parser = argparse.ArgumentParser(description="CDK Deployment Script")
     parser.add_argument("command", choices=["deploy", "destroy", "synth", "list", "create"], help="Command to execute")
     parser.add_argument("stack", nargs="?", choices=["app", "kb"], help="Stack to operate on (optional)")
     parser.add_argument("--customer", help="Customer name")
+    parser.add_argument("--force", action="store_true", help="Re-run dependency checks and npm install instead of using cached results")
 
     args = parser.parse_args()
 
+    print("🔍 Checking for required dependencies...")
+    check_customers_dir()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        checks = [executor.submit(check, args.force) for check in (check_cdk_cli, check_docker, check_bedrock_models)]
+    for check in checks:
+        # Re-raises the SystemExit of a failed check
+        check.result()
+
     if args.command == "list":
         list_customers()
         return
@@ -293,8 +477,7 @@ def main():
 
     check_context_file(args.customer)
     load_customer_context(args.customer)
-    print("📦 Installing npm dependencies...")
-    npm_install()
+    npm_install(args.force)
 
     if args.command == "deploy":
         deploy(args.stack)